@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy.exc import IntegrityError
 from .config import Config
 
 db = SQLAlchemy()
@@ -21,6 +22,30 @@ def create_app():
 
     from .main import main as main_blueprint
     app.register_blueprint(main_blueprint)
+
+    from . import archive
+    archive.init_app(app)
+
+    from . import drift
+    drift.init_app(app)
+
+    from . import evaluation
+    evaluation.init_app(app)
+
+    from . import compaction
+    compaction.init_app(app)
+
+    from . import assets
+    assets.init_app(app)
+
+    from . import scheduling
+    scheduling.init_app(app)
+
+    from . import events
+    events.init_app(app)
+
+    from . import cache
+    cache.init_app(app)
     
     # Import models within app creation context (optional, but good practice)
     from .models import User
@@ -31,5 +56,13 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        # create_all skips tables that already exist; add indexes introduced since the database was created
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(db.engine, checkfirst=True)
+                except IntegrityError as e:
+                    # Existing rows break a new unique index (e.g. appointments double-booked before it existed)
+                    print(f"Warning: index {index.name} not created, fix the conflicting rows and restart: {e.orig}")
 
     return app
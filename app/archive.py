@@ -0,0 +1,296 @@
+import os
+import json
+import uuid
+import datetime
+import click
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func
+from . import db
+from .models import Patient, Prediction, PredictionExplanation, PredictionRollup, ArchivedPatientDay
+from .cache import response_cache, PREDICTIONS
+
+# Columns written to the Parquet partitions (one directory per day: date=YYYY-MM-DD)
+ARCHIVE_COLUMNS = ['id', 'patient_id', 'prediction_result', 'probability_score', 'model_used', 'input_data', 'created_at']
+# Explanation JSON travels with its prediction (older partitions may not have it)
+EXPLANATION_COLUMN = 'explanation'
+
+
+class ArchivedExplanation:
+    """Read-only stand-in for the PredictionExplanation stored with an archived row."""
+    def __init__(self, payload):
+        self.payload = payload
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+
+class ArchivedPrediction:
+    """
+    Read-only stand-in for a Prediction row loaded from the archive.
+    Exposes the same attributes the history templates and exports use,
+    including `explanation` (None for partitions written without it).
+    """
+    def __init__(self, row, patient=None):
+        self.id = int(row['id'])
+        self.patient_id = int(row['patient_id'])
+        self.prediction_result = row['prediction_result']
+        self.probability_score = float(row['probability_score']) if pd.notna(row['probability_score']) else 0.0
+        self.model_used = row['model_used']
+        self.input_data = row['input_data']
+        self.created_at = pd.Timestamp(row['created_at']).to_pydatetime()
+        payload = row.get(EXPLANATION_COLUMN)
+        self.explanation = ArchivedExplanation(payload) if isinstance(payload, str) else None
+        self.patient = patient
+
+
+def archive_dir():
+    return current_app.config['PREDICTION_ARCHIVE_DIR']
+
+
+def retention_cutoff(days=None):
+    """Midnight of the oldest day that stays in the live table."""
+    if days is None:
+        days = current_app.config['PREDICTION_RETENTION_DAYS']
+    cutoff = datetime.datetime.utcnow().date() - datetime.timedelta(days=days)
+    return datetime.datetime.combine(cutoff, datetime.time.min)
+
+
+def _partition_path(day):
+    return os.path.join(archive_dir(), f"date={day.isoformat()}")
+
+
+def _partition_days():
+    """Sorted list of days that have at least one archive partition."""
+    base = archive_dir()
+    if not os.path.isdir(base):
+        return []
+    days = []
+    for name in os.listdir(base):
+        if name.startswith('date='):
+            try:
+                days.append(datetime.date.fromisoformat(name[5:]))
+            except ValueError:
+                continue
+    return sorted(days)
+
+
+def _partition_files(day):
+    path = _partition_path(day)
+    return [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.parquet')]
+
+
+def _bump_rollup(day, model_used, prediction_result, delta):
+    # groupby(dropna=False) hands back NaN for missing labels
+    model_used = None if pd.isna(model_used) else model_used
+    prediction_result = None if pd.isna(prediction_result) else prediction_result
+    rollup = PredictionRollup.query.filter_by(day=day, model_used=model_used, prediction_result=prediction_result).first()
+    if rollup is None:
+        rollup = PredictionRollup(day=day, model_used=model_used, prediction_result=prediction_result, count=0)
+        db.session.add(rollup)
+    rollup.count += delta
+
+
+def _index_patient_days(df):
+    """Record which partitions (days) of `df` hold each patient's rows."""
+    pairs = {(int(patient_id), day) for patient_id, day in zip(df['patient_id'], df['day'])}
+    days = {day for _, day in pairs}
+    existing = set(db.session.query(ArchivedPatientDay.patient_id, ArchivedPatientDay.day)
+                   .filter(ArchivedPatientDay.day.in_(days)).all())
+    db.session.add_all([ArchivedPatientDay(patient_id=patient_id, day=day) for patient_id, day in pairs - existing])
+
+
+def patient_days(patient_ids):
+    """Sorted days whose partitions hold predictions of any of `patient_ids`."""
+    rows = db.session.query(ArchivedPatientDay.day).filter(ArchivedPatientDay.patient_id.in_(list(patient_ids))).distinct()
+    return sorted(row[0] for row in rows)
+
+
+def archive_predictions(days=None, batch_size=5000):
+    """
+    Move predictions older than the retention window into compressed,
+    date-partitioned Parquet files and fold their counts into PredictionRollup.
+    Works in batches so memory stays bounded; returns the number of rows archived.
+    """
+    cutoff = retention_cutoff(days)
+    archived = 0
+
+    while True:
+        batch = Prediction.query.filter(Prediction.created_at < cutoff).order_by(Prediction.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        batch_ids = [p.id for p in batch]
+        explanations = dict(db.session.query(PredictionExplanation.prediction_id, PredictionExplanation.payload)
+                            .filter(PredictionExplanation.prediction_id.in_(batch_ids)).all())
+        df = pd.DataFrame([{col: getattr(p, col) for col in ARCHIVE_COLUMNS} for p in batch], columns=ARCHIVE_COLUMNS)
+        df[EXPLANATION_COLUMN] = [explanations.get(p.id) for p in batch]
+        df['created_at'] = pd.to_datetime(df['created_at'])
+        df['day'] = df['created_at'].dt.date
+
+        written = []
+        try:
+            for day, part in df.groupby('day'):
+                path = _partition_path(day)
+                os.makedirs(path, exist_ok=True)
+                filename = os.path.join(path, f"part-{uuid.uuid4().hex}.parquet")
+                part.drop(columns=['day']).to_parquet(filename, compression='zstd', index=False)
+                written.append(filename)
+
+            counts = df.groupby(['day', 'model_used', 'prediction_result'], dropna=False).size()
+            for (day, model_used, prediction_result), n in counts.items():
+                _bump_rollup(day, model_used, prediction_result, int(n))
+            _index_patient_days(df)
+
+            PredictionExplanation.query.filter(PredictionExplanation.prediction_id.in_(batch_ids)).delete(synchronize_session=False)
+            Prediction.query.filter(Prediction.id.in_(batch_ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            # Keep the live rows and drop the half-written batch so a rerun does not duplicate it
+            db.session.rollback()
+            for filename in written:
+                os.remove(filename)
+            raise
+
+        archived += len(batch)
+
+    if archived:
+        response_cache.bump(PREDICTIONS)
+    return archived
+
+
+def reaches_archive(start):
+    """True when a history filter starting at `start` needs archived rows."""
+    days = _partition_days()
+    return bool(days) and start.date() <= days[-1]
+
+
+def query_archive(start=None, end=None, patient_ids=None, risk_status=None, model_used=None):
+    """
+    Read archived predictions in [start, end) matching the history filters.
+    Only partitions inside the date range (and, with patient_ids, holding
+    those patients) are opened. Rows of deleted patients are skipped.
+    """
+    if patient_ids is not None:
+        if not patient_ids:
+            return []
+        days = patient_days(patient_ids)
+    else:
+        days = _partition_days()
+    if start is not None:
+        days = [d for d in days if d >= start.date()]
+    if end is not None:
+        days = [d for d in days if d <= end.date()]
+
+    files = [f for d in days for f in _partition_files(d)]
+    if not files:
+        return []
+
+    filters = []
+    if risk_status:
+        filters.append(('prediction_result', '==', risk_status))
+    if model_used:
+        filters.append(('model_used', '==', model_used))
+    if patient_ids is not None:
+        filters.append(('patient_id', 'in', list(patient_ids)))
+
+    frames = [pd.read_parquet(f, filters=filters or None) for f in files]
+    df = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        df = df[df['created_at'] >= start]
+    if end is not None:
+        df = df[df['created_at'] < end]
+    if df.empty:
+        return []
+
+    ids = df['patient_id'].unique().tolist()
+    patients = {p.id: p for p in Patient.query.filter(Patient.id.in_(ids)).all()}
+    df = df[df['patient_id'].isin(list(patients))]
+    return [ArchivedPrediction(row, patients[int(row['patient_id'])]) for _, row in df.iterrows()]
+
+
+def purge_patient(patient_id):
+    """
+    Take a deleted patient's archived rows out of the rollups and the partition
+    index, inside the caller's transaction. The Parquet files are not touched;
+    once the transaction has committed, pass the returned days to
+    remove_from_partitions().
+    """
+    days = patient_days([patient_id])
+    for day in days:
+        for filename in _partition_files(day):
+            dropped = pd.read_parquet(filename, columns=['model_used', 'prediction_result'],
+                                      filters=[('patient_id', '==', patient_id)])
+            counts = dropped.groupby(['model_used', 'prediction_result'], dropna=False).size()
+            for (model_used, prediction_result), n in counts.items():
+                _bump_rollup(day, model_used, prediction_result, -int(n))
+    ArchivedPatientDay.query.filter_by(patient_id=patient_id).delete(synchronize_session=False)
+    return days
+
+
+def remove_from_partitions(patient_id, days):
+    """
+    Rewrite the partitions of `days` without the patient's rows. Each file is
+    written next to the original and swapped in with os.replace, so readers
+    never see a half-written partition. Returns the number of rows removed.
+    """
+    removed = 0
+    for day in days:
+        for filename in _partition_files(day):
+            df = pd.read_parquet(filename)
+            kept = df[df['patient_id'] != patient_id]
+            if len(kept) == len(df):
+                continue
+            if kept.empty:
+                os.remove(filename)
+            else:
+                tmp = f"{filename}.{uuid.uuid4().hex}.tmp"
+                kept.to_parquet(tmp, compression='zstd', index=False)
+                os.replace(tmp, filename)
+            removed += len(df) - len(kept)
+    return removed
+
+
+def rebuild_patient_index():
+    """Rebuild ArchivedPatientDay from the partition files; returns the number of entries."""
+    ArchivedPatientDay.query.delete()
+    entries = 0
+    for day in _partition_days():
+        ids = set()
+        for filename in _partition_files(day):
+            ids.update(int(x) for x in pd.read_parquet(filename, columns=['patient_id'])['patient_id'])
+        db.session.add_all([ArchivedPatientDay(patient_id=patient_id, day=day) for patient_id in ids])
+        entries += len(ids)
+    db.session.commit()
+    return entries
+
+
+def archived_total(prediction_result=None):
+    query = db.session.query(func.coalesce(func.sum(PredictionRollup.count), 0))
+    if prediction_result:
+        query = query.filter(PredictionRollup.prediction_result == prediction_result)
+    return int(query.scalar())
+
+
+def archived_counts_by_model(prediction_result=None):
+    query = db.session.query(PredictionRollup.model_used, func.sum(PredictionRollup.count))
+    if prediction_result:
+        query = query.filter(PredictionRollup.prediction_result == prediction_result)
+    return {model: int(n) for model, n in query.group_by(PredictionRollup.model_used).all()}
+
+
+def init_app(app):
+    @app.cli.command('archive-predictions')
+    @click.option('--days', type=int, default=None, help='Retention window in days (defaults to PREDICTION_RETENTION_DAYS).')
+    @click.option('--batch-size', type=int, default=5000)
+    def archive_predictions_command(days, batch_size):
+        """Move old predictions to the Parquet archive."""
+        n = archive_predictions(days=days, batch_size=batch_size)
+        click.echo(f"Archived {n} predictions to {archive_dir()}")
+
+    @app.cli.command('reindex-archive')
+    def reindex_archive_command():
+        """Rebuild the patient index of the Parquet archive."""
+        n = rebuild_patient_index()
+        click.echo(f"Indexed {n} patient/day entries in {archive_dir()}")
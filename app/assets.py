@@ -0,0 +1,296 @@
+import os
+import re
+import io
+import gzip
+import json
+import shutil
+import hashlib
+import mimetypes
+import click
+from flask import current_app, request, url_for, send_from_directory
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Build output, relative to the static folder
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Longest side of the served images; backgrounds are full-screen, everything else is a small UI image
+IMAGE_MAX_SIZE = {'images/backgrounds/': 1920}
+DEFAULT_IMAGE_MAX_SIZE = 512
+JPEG_QUALITY = 80
+WEBP_QUALITY = 78
+AVIF_QUALITY = 60
+
+# Navbar logo and favicon; `build-assets --logo` replaces it before building
+LOGO_PATH = 'images/logo.jpeg'
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+TEXT_EXTENSIONS = ('.css', '.js', '.svg')
+
+# Hashed files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CSS_URL = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+CSS_BACKGROUND = re.compile(r"""background-image:\s*url\((['"]?)([^'")]+)\1\)\s*;""")
+
+
+def _hashed_name(path, data):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _write(out_root, path, data):
+    full = os.path.join(out_root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, 'wb') as f:
+        f.write(data)
+
+
+def _write_precompressed(out_root, path, data):
+    """Store .gz (and .br when brotli is installed) next to a text asset."""
+    _write(out_root, path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    if BROTLI_AVAILABLE:
+        _write(out_root, path + '.br', brotli.compress(data, quality=11))
+
+
+def _encode(image, fmt, **options):
+    buf = io.BytesIO()
+    image.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def _build_image(static_dir, out_root, rel_path):
+    image = Image.open(os.path.join(static_dir, rel_path))
+    max_size = next((size for prefix, size in IMAGE_MAX_SIZE.items() if rel_path.startswith(prefix)), DEFAULT_IMAGE_MAX_SIZE)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    # Fallback in the original family: PNG keeps transparency, everything else becomes progressive JPEG
+    if has_alpha:
+        fallback_path = os.path.splitext(rel_path)[0] + '.png'
+        fallback = _encode(image, 'PNG', optimize=True)
+    else:
+        fallback_path = os.path.splitext(rel_path)[0] + '.jpg'
+        fallback = _encode(image, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+    entry = {'file': _hashed_name(fallback_path, fallback)}
+    _write(out_root, entry['file'], fallback)
+
+    variants = [('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6})]
+    if features.check('avif'):
+        variants.append(('avif', 'AVIF', {'quality': AVIF_QUALITY}))
+    for key, fmt, options in variants:
+        data = _encode(image, fmt, **options)
+        entry[key] = _hashed_name(os.path.splitext(rel_path)[0] + '.' + key, data)
+        _write(out_root, entry[key], data)
+    return entry
+
+
+def install_logo(static_dir, source):
+    """Copy a new logo image to LOGO_PATH, re-encoding it as JPEG if it is in another format."""
+    dest = os.path.join(static_dir, LOGO_PATH)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if os.path.exists(dest) and os.path.samefile(source, dest):
+        return dest
+    with Image.open(source) as image:
+        if image.format == 'JPEG':
+            shutil.copy2(source, dest)
+        else:
+            image.convert('RGB').save(dest, 'JPEG', quality=95)
+    return dest
+
+
+def logo_colors(path, n=3):
+    """The image's n most common colours as hex strings, for matching the theme to a new logo."""
+    with Image.open(path) as image:
+        palette = image.convert('RGB').resize((150, 150)).convert('P', palette=Image.Palette.ADAPTIVE, colors=5)
+    rgb = palette.getpalette()
+    return ['#{:02x}{:02x}{:02x}'.format(*rgb[3 * i:3 * i + 3]) for _, i in sorted(palette.getcolors(), reverse=True)[:n]]
+
+
+def _resolve(css_path, ref):
+    """Static-relative path of a url() reference inside a stylesheet, or None for external ones."""
+    if ref.startswith(('data:', 'http:', 'https:', '//', '#')):
+        return None
+    return os.path.normpath(os.path.join(os.path.dirname(css_path), ref)).replace(os.sep, '/')
+
+
+def _relative(css_file, target):
+    return os.path.relpath(target, os.path.dirname(css_file)).replace(os.sep, '/')
+
+
+def _rewrite_css(css_path, text, manifest):
+    """
+    Point url() references at hashed files. background-image declarations get an
+    image-set() with AVIF/WebP after the plain fallback, so older browsers keep the JPEG/PNG.
+    The hashed stylesheet lands in the same relative directory under dist/, so
+    relative references stay valid.
+    """
+    def background(match):
+        entry = manifest.get(_resolve(css_path, match.group(2)) or '')
+        if not entry or 'file' not in entry:
+            return match.group(0)
+        fallback = _relative(css_path, entry['file'])
+        options = [f'url("{_relative(css_path, entry[k])}") type("image/{k}")' for k in ('avif', 'webp') if k in entry]
+        kind = 'png' if entry['file'].endswith('.png') else 'jpeg'
+        options.append(f'url("{fallback}") type("image/{kind}")')
+        return f'background-image: url("{fallback}");\n    background-image: image-set({", ".join(options)});'
+
+    def plain(match):
+        resolved = _resolve(css_path, match.group(2))
+        if resolved is None or resolved in hashed:
+            return match.group(0)
+        entry = manifest.get(resolved)
+        if entry:
+            return f'url("{_relative(css_path, entry["file"])}")'
+        # Not built (fonts, gifs, missing files): keep pointing at the original location
+        return f'url("{_relative(DIST_DIR + "/" + css_path, resolved)}")'
+
+    text = CSS_BACKGROUND.sub(background, text)
+    # Remaining url()s, skipping the hashed ones image-set() just wrote
+    hashed = {entry[k] for entry in manifest.values() for k in ('file', 'webp', 'avif') if k in entry}
+    return CSS_URL.sub(plain, text)
+
+
+def build_assets(static_dir, logo=None):
+    """
+    Build app/static/dist: resized and recompressed images (WebP, AVIF when
+    Pillow supports it, and a JPEG/PNG fallback), content-hashed file names,
+    stylesheets rewritten to the hashed images, .gz/.br copies of text assets
+    and a manifest mapping original paths to the built files. `logo`, if
+    given, is installed as the site logo first.
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow is required to build assets (pip install Pillow)")
+    if logo:
+        install_logo(static_dir, logo)
+
+    out_root = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+    text_assets = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_root]
+        for name in sorted(files):
+            rel_path = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+            ext = os.path.splitext(name)[1].lower()
+            if ext in IMAGE_EXTENSIONS:
+                manifest[rel_path] = _build_image(static_dir, out_root, rel_path)
+            elif ext in TEXT_EXTENSIONS:
+                text_assets.append(rel_path)
+
+    # Text assets last, so stylesheets can point at the hashed images
+    for rel_path in text_assets:
+        with open(os.path.join(static_dir, rel_path), 'rb') as f:
+            data = f.read()
+        if rel_path.endswith('.css'):
+            data = _rewrite_css(rel_path, data.decode('utf-8'), manifest).encode('utf-8')
+        hashed = _hashed_name(rel_path, data)
+        _write(out_root, hashed, data)
+        _write_precompressed(out_root, hashed, data)
+        manifest[rel_path] = {'file': hashed}
+
+    _write(out_root, MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def manifest_hash(manifest):
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:12] if manifest else 'none'
+
+
+def build_id():
+    """
+    Identifies what rendered pages link to: the manifest in use (or 'source'
+    when ASSETS_USE_MANIFEST is off) plus the deploy's BUILD_ID. Part of the
+    response cache key, so a page is never served with another build's asset URLs.
+    """
+    assets = current_app.extensions.get('asset_manifest_hash', 'none') if current_app.config['ASSETS_USE_MANIFEST'] else 'source'
+    return f"{assets}:{current_app.config['BUILD_ID']}"
+
+
+def asset_url(filename, variant=None):
+    """
+    url_for('static') that prefers the built, content-hashed file.
+    variant='webp'/'avif' returns that encoding's URL, or None if it was not built.
+    """
+    manifest = current_app.extensions.get('asset_manifest', {}) if current_app.config['ASSETS_USE_MANIFEST'] else {}
+    entry = manifest.get(filename)
+    if variant:
+        if not entry or variant not in entry:
+            return None
+        return url_for('static', filename=f"{DIST_DIR}/{entry[variant]}")
+    if not entry:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=f"{DIST_DIR}/{entry['file']}")
+
+
+def serve_static(filename):
+    """
+    Static view: hashed files under dist/ are served precompressed when the
+    client accepts it, with immutable cache headers; everything else is unchanged.
+    """
+    static_dir = current_app.static_folder
+    if not filename.startswith(DIST_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    accepted = request.accept_encodings
+    response = None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(static_dir, filename + suffix)):
+            response = send_from_directory(static_dir, filename + suffix, max_age=31536000)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            break
+    if response is None:
+        response = send_from_directory(static_dir, filename, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    app.extensions['asset_manifest'] = load_manifest(app)
+    app.extensions['asset_manifest_hash'] = manifest_hash(app.extensions['asset_manifest'])
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.view_functions['static'] = serve_static
+
+    @app.cli.command('build-assets')
+    @click.option('--logo', type=click.Path(exists=True, dir_okay=False), help=f'Replace {LOGO_PATH} with this image first.')
+    def build_assets_command(logo):
+        """Resize/recompress images, hash file names and precompress CSS into static/dist."""
+        manifest = build_assets(app.static_folder, logo=logo)
+        app.extensions['asset_manifest'] = manifest
+        app.extensions['asset_manifest_hash'] = manifest_hash(manifest)
+        before = after = 0
+        for source, entry in manifest.items():
+            size = os.path.getsize(os.path.join(app.static_folder, source))
+            built = min(os.path.getsize(os.path.join(app.static_folder, DIST_DIR, entry[k]))
+                        for k in ('file', 'webp', 'avif') if k in entry)
+            before += size
+            after += built
+            click.echo(f"{source:40s} {size / 1024:9.1f}KB -> {built / 1024:8.1f}KB  {entry['file']}")
+        click.echo(f"Total {before / 1024:.1f}KB -> {after / 1024:.1f}KB (smallest variant each)")
+        if logo:
+            click.echo(f"Logo installed from {logo}; dominant colours: "
+                       f"{', '.join(logo_colors(os.path.join(app.static_folder, LOGO_PATH)))}")
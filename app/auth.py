@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 from .models import User
+from .cache import response_cache, USERS
 
 auth = Blueprint('auth', __name__)
 
@@ -54,6 +55,7 @@ def register():
 
         db.session.add(new_user)
         db.session.commit()
+        response_cache.bump(USERS)
 
         flash('Signup successful! Wait for admin approval or login now.', 'success') 
         # For simplicity, allow login immediately usually
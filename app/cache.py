@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import datetime
+import functools
+import threading
+from collections import OrderedDict
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from .assets import build_id
+
+# Data each cached view depends on; write paths bump these
+PREDICTIONS = 'predictions'
+PATIENTS = 'patients'
+APPOINTMENTS = 'appointments'
+USERS = 'users'
+
+# Sets between sweeps of expired/excess rows in the SQLite backend
+SQLITE_SWEEP_EVERY = 64
+
+
+class MemoryBackend:
+    """Per-process LRU store. Only sees invalidations from its own worker."""
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires'] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, names):
+        with self._lock:
+            return {name: self._versions.get(name, 0) for name in names}
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """
+    Store in a local SQLite file (WAL mode), so every gunicorn worker on the
+    host shares entries and version counters.
+    """
+    def __init__(self, path, max_entries=512):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._sets = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, version TEXT, etag TEXT, '
+                     'mimetype TEXT, body BLOB, expires REAL, stored_at REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT version, etag, mimetype, body, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[4] < time.time():
+            return None
+        return {'version': row[0], 'etag': row[1], 'mimetype': row[2], 'body': row[3], 'expires': row[4]}
+
+    def set(self, key, entry):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (key, entry['version'], entry['etag'], entry['mimetype'], entry['body'], entry['expires'], time.time()))
+        self._sets += 1
+        if self._sets % SQLITE_SWEEP_EVERY == 0:
+            conn.execute('DELETE FROM entries WHERE expires < ?', (time.time(),))
+            conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+        conn.commit()
+
+    def versions(self, names):
+        placeholders = ','.join('?' * len(names))
+        rows = self._conn().execute(f'SELECT name, value FROM versions WHERE name IN ({placeholders})', list(names)).fetchall()
+        found = dict(rows)
+        return {name: found.get(name, 0) for name in names}
+
+    def bump(self, names):
+        conn = self._conn()
+        conn.executemany('INSERT INTO versions VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1',
+                         [(name,) for name in names])
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM entries')
+        conn.commit()
+
+
+class ResponseCache:
+    """
+    Caches whole GET responses of read-heavy views. Entries are keyed by
+    endpoint, path and query string, the user's role and id (pages show the
+    user's name), the current date and the build (asset manifest and deploy),
+    and are tagged with the version counters of the data the view reads.
+    Write paths bump those counters, so stale entries are never served; a
+    timeout bounds anything changed outside the request cycle (CLI commands,
+    metrics files). Responses carry an ETag and revalidate to 304.
+
+    The aggregates behind those pages are cached separately with fragment(),
+    shared by every user of a role, so a user's first view only re-renders.
+    """
+    def __init__(self):
+        self.backend = None
+        self.timeout = 300
+
+    def init_app(self, app):
+        kind = app.config['CACHE_BACKEND']
+        max_entries = app.config['CACHE_MAX_ENTRIES']
+        if kind == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        elif kind == 'sqlite':
+            self.backend = SQLiteBackend(app.config['CACHE_SQLITE_PATH'], max_entries)
+        elif kind in ('none', '', None):
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND '{kind}' (expected memory, sqlite or none)")
+        self.timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+
+    def bump(self, *names):
+        """Invalidate every cached view that depends on any of `names`. Call after the commit."""
+        if self.backend is not None:
+            self.backend.bump(names)
+
+    def _key(self):
+        return '|'.join([request.endpoint, request.full_path, current_user.role or '', str(current_user.get_id()),
+                         datetime.date.today().isoformat(), build_id()])
+
+    def _version(self, depends_on):
+        return ';'.join(f"{name}={n}" for name, n in self.backend.versions(depends_on).items())
+
+    def fragment(self, name, depends_on, compute):
+        """
+        compute()'s JSON-serializable result, shared by every user of the same
+        role until one of `depends_on` is bumped (or the day changes).
+        """
+        if self.backend is None:
+            return compute()
+        key = '|'.join(['fragment', name, current_user.role or '', datetime.date.today().isoformat(),
+                        current_app.config['BUILD_ID']])
+        version = self._version(depends_on)
+        entry = self.backend.get(key)
+        if entry is not None and entry['version'] == version:
+            return json.loads(entry['body'])
+        value = compute()
+        self.backend.set(key, {'version': version, 'etag': '', 'mimetype': 'application/json',
+                               'body': json.dumps(value).encode('utf-8'), 'expires': time.time() + self.timeout})
+        return value
+
+    def cached(self, *depends_on):
+        """View decorator; place it below @login_required."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pending flash messages are rendered into the page, so it is not reusable
+                if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                key = self._key()
+                version = self._version(depends_on)
+                entry = self.backend.get(key)
+                if entry is None or entry['version'] != version:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed or session.get('_flashes'):
+                        return response
+                    body = response.get_data()
+                    entry = {'version': version, 'etag': hashlib.sha1(body).hexdigest(), 'mimetype': response.mimetype,
+                             'body': body, 'expires': time.time() + self.timeout}
+                    self.backend.set(key, entry)
+                    cache_status = 'MISS'
+                else:
+                    response = make_response(entry['body'])
+                    response.mimetype = entry['mimetype']
+                    cache_status = 'HIT'
+
+                response.set_etag(entry['etag'])
+                # Per-user pages: browsers may keep them but must revalidate each time
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response.headers['X-Cache'] = cache_status
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+def init_app(app):
+    response_cache.init_app(app)
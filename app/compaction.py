@@ -0,0 +1,337 @@
+import os
+import io
+import time
+import pickle
+import tracemalloc
+import contextlib
+import click
+import numpy as np
+from .ml_utils import FlatForest, model_handler
+
+# Leaf probabilities are stored as float32; this bounds the rounding they add
+FLOAT32_PROB_TOLERANCE = 1e-6
+
+# Synthetic probe rows used to check deviation when no validation set is given
+PROBE_ROWS = 2000
+
+
+def _reindex(forest, roots):
+    """
+    Copy of `forest` holding only the nodes reachable from `roots`,
+    renumbered breadth-first. Also recomputes max_depth.
+    """
+    levels = []
+    frontier = np.asarray(roots)
+    while len(frontier):
+        levels.append(frontier)
+        internal = frontier[forest.left[frontier] != frontier]
+        frontier = np.concatenate([forest.left[internal], forest.right[internal]])
+    order = np.concatenate(levels)
+
+    new_index = np.full(forest.node_count, -1, dtype=np.int64)
+    new_index[order] = np.arange(len(order))
+    return FlatForest(forest.feature[order], forest.threshold[order],
+                      new_index[forest.left[order]], new_index[forest.right[order]],
+                      new_index[np.asarray(roots)], forest.prob[order], len(levels) - 1, forest.n_features_in_)
+
+
+def merge_redundant_nodes(forest):
+    """
+    Turn every subtree whose leaves all predict the same probability into a
+    single leaf. Predictions are unchanged. sklearn never splits a pure node,
+    so grown forests rarely have these; prune_nodes() does the lossy merging.
+    """
+    nodes = np.arange(forest.node_count)
+    is_leaf = forest.left == nodes
+
+    levels = []
+    frontier = forest.roots
+    while len(frontier):
+        levels.append(frontier)
+        internal = frontier[~is_leaf[frontier]]
+        frontier = np.concatenate([forest.left[internal], forest.right[internal]])
+
+    # constant[n] is the shared leaf probability under n, or NaN if the leaves differ
+    constant = np.where(is_leaf, forest.prob.astype(np.float64), np.nan)
+    for level in reversed(levels):
+        internal = level[~is_leaf[level]]
+        left, right = constant[forest.left[internal]], constant[forest.right[internal]]
+        constant[internal] = np.where(left == right, left, np.nan)
+
+    collapse = ~is_leaf & ~np.isnan(constant)
+    left, right, prob = forest.left.copy(), forest.right.copy(), forest.prob.copy()
+    left[collapse] = nodes[collapse]
+    right[collapse] = nodes[collapse]
+    prob[collapse] = constant[collapse]
+    merged = FlatForest(forest.feature, forest.threshold, left, right, forest.roots, prob,
+                        forest.max_depth, forest.n_features_in_)
+    return _reindex(merged, forest.roots)
+
+
+def prune_nodes(forest, X, max_deviation, y=None, reference=None):
+    """
+    Greedily turn internal nodes whose children are both leaves into leaves
+    predicting the node's own training probability, smallest change first,
+    while the averaged probability stays within `max_deviation` of `reference`
+    (defaults to the forest itself) on every row of X and, with labels for the
+    first len(y) rows, accuracy does not fall below the reference's. Repeats
+    until nothing more can be merged, so whole subtrees fold up. Like
+    select_trees, the bound is measured on X, not guaranteed for other inputs.
+    Returns (FlatForest, achieved max deviation).
+    """
+    nodes = np.arange(forest.node_count)
+    left, right = forest.left.copy(), forest.right.copy()
+    prob = forest.prob.astype(np.float64)
+    is_leaf = left == nodes
+
+    reached = forest.leaves(X)  # (n_rows, n_trees); node ids are unique across trees
+    current = prob[reached].mean(axis=1)
+    deviation = current - (current if reference is None else reference)
+    if y is not None:
+        labeled = np.arange(len(y))
+        reference_scores = current if reference is None else reference
+        needed = ((reference_scores[labeled] > 0.5) == y).sum()
+        correct = np.zeros(len(X), dtype=bool)
+        correct[labeled] = (current[labeled] > 0.5) == y
+        y_all = np.zeros(len(X))
+        y_all[labeled] = y
+
+    # Rows currently landing on each leaf
+    flat = reached.ravel()
+    order = np.argsort(flat, kind='stable')
+    row_ids = np.tile(np.arange(len(X)), (forest.n_trees, 1)).T.ravel()[order]
+    starts = np.searchsorted(flat[order], nodes)
+    ends = np.searchsorted(flat[order], nodes, side='right')
+    rows_at = {n: row_ids[a:b] for n, a, b in zip(nodes, starts, ends) if b > a}
+    empty = np.zeros(0, dtype=np.int64)
+
+    def change(node):
+        l, r = left[node], right[node]
+        rows_l, rows_r = rows_at.get(l, empty), rows_at.get(r, empty)
+        delta = np.concatenate([np.full(len(rows_l), prob[node] - prob[l]),
+                                np.full(len(rows_r), prob[node] - prob[r])]) / forest.n_trees
+        return np.concatenate([rows_l, rows_r]), delta
+
+    while True:
+        internal = nodes[~is_leaf]
+        candidates = internal[is_leaf[left[internal]] & is_leaf[right[internal]]]
+        impact = []
+        for node in candidates:
+            rows, delta = change(node)
+            impact.append(np.abs(deviation[rows] + delta).max() if len(rows) else 0.0)
+
+        merged = 0
+        for node in candidates[np.argsort(impact, kind='stable')]:
+            rows, delta = change(node)
+            if len(rows) and np.abs(deviation[rows] + delta).max() > max_deviation:
+                continue
+            if y is not None and len(rows):
+                now_correct = (current[rows] + delta > 0.5) == y_all[rows]
+                is_labeled = rows < len(y)
+                if correct.sum() - correct[rows].sum() + now_correct[is_labeled].sum() < needed:
+                    continue
+                correct[rows[is_labeled]] = now_correct[is_labeled]
+            deviation[rows] += delta
+            current[rows] += delta
+            rows_at[node] = rows
+            rows_at.pop(left[node], None)
+            rows_at.pop(right[node], None)
+            left[node] = right[node] = node
+            is_leaf[node] = True
+            merged += 1
+        if not merged:
+            break
+
+    pruned = FlatForest(forest.feature, forest.threshold, left, right, forest.roots, prob,
+                        forest.max_depth, forest.n_features_in_)
+    return _reindex(pruned, forest.roots), float(np.abs(deviation).max())
+
+
+def float32_thresholds(threshold):
+    """
+    Round thresholds down to the nearest float32. Trees compare float32 inputs,
+    and for a float32 x, x <= t holds exactly when x <= round_down_f32(t), so
+    no split decision changes.
+    """
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+
+def select_trees(forest, X_val, max_deviation, y_val=None):
+    """
+    Greedily pick the smallest set of trees whose averaged probability stays
+    within `max_deviation` of the full forest on every row of X_val (and,
+    with labels for its first len(y_val) rows, keeps at least the full
+    forest's accuracy). Returns (tree indices, achieved max deviation).
+    """
+    per_tree = forest.prob[forest.leaves(X_val)].astype(np.float64)  # (n_rows, n_trees)
+    full = per_tree.mean(axis=1)
+    labeled = slice(0, len(y_val)) if y_val is not None else None
+    full_accuracy = ((full[labeled] > 0.5) == y_val).mean() if y_val is not None else None
+
+    selected, remaining = [], list(range(forest.n_trees))
+    total = np.zeros(len(X_val))
+    deviation = np.inf
+    while remaining:
+        candidates = (total[:, None] + per_tree[:, remaining]) / (len(selected) + 1)
+        deviations = np.abs(candidates - full[:, None]).max(axis=0)
+        best = int(np.argmin(deviations))
+        tree = remaining.pop(best)
+        selected.append(tree)
+        total += per_tree[:, tree]
+        deviation = deviations[best]
+
+        accurate = full_accuracy is None or ((total[labeled] / len(selected) > 0.5) == y_val).mean() >= full_accuracy
+        if deviation <= max_deviation and accurate:
+            break
+    return sorted(selected), float(deviation)
+
+
+def compact_forest(model, X_val=None, y_val=None, max_deviation=0.0):
+    """
+    Slim serving copy of a fitted RandomForestClassifier (or FlatForest):
+    merged redundant nodes, float32 thresholds and leaf probabilities, compact
+    integer indices and no training-only attributes. With check rows (X_val,
+    labeled by y_val for its first rows) and max_deviation > 0, half the
+    budget is spent dropping trees and the rest merging nodes, both measured
+    against the full forest on X_val. Returns (FlatForest, info dict).
+    """
+    forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    info = {'trees_before': forest.n_trees, 'nodes_before': forest.node_count}
+
+    forest = merge_redundant_nodes(forest)
+    info['nodes_after_merge'] = forest.node_count
+
+    if X_val is not None and max_deviation > 0:
+        reference = forest.predict_proba(X_val)[:, 1]
+        trees, deviation = select_trees(forest, X_val, max_deviation / 2, y_val)
+        forest = _reindex(forest, forest.roots[trees])
+        # Leave room for the float32 rounding of leaf probabilities
+        forest, deviation = prune_nodes(forest, X_val, max_deviation - FLOAT32_PROB_TOLERANCE, y_val, reference)
+        info['validation_deviation'] = deviation
+
+    index_type = np.int32 if forest.node_count < 2 ** 31 else np.int64
+    compact = FlatForest(forest.feature.astype(np.int16), float32_thresholds(forest.threshold),
+                         forest.left.astype(index_type), forest.right.astype(index_type),
+                         forest.roots.astype(index_type), forest.prob.astype(np.float32),
+                         forest.max_depth, forest.n_features_in_)
+    info.update({'trees_after': compact.n_trees, 'nodes_after': compact.node_count, 'max_depth': compact.max_depth})
+    return compact, info
+
+
+def _timed_load(load, repeat=5):
+    """(loaded object, best load seconds, peak traced bytes while loading)."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        obj = load()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    obj = load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, best, peak
+
+
+def _timed_inference(model, X, repeat=3):
+    """(best batch seconds, mean single-row seconds)."""
+    batch = min(_time(lambda: model.predict_proba(X)) for _ in range(repeat))
+    rows = X[:100]
+    single = sum(_time(lambda row=row: model.predict_proba(row[None, :])) for row in rows) / len(rows)
+    return batch, single
+
+
+def _time(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def benchmark(original_path, compact_path, X):
+    """Size, load time, load memory and inference speed for both artifacts, plus max deviation on X."""
+    def load_original():
+        with open(original_path, 'rb') as f:
+            obj = pickle.load(f)
+        return obj.get('model') if isinstance(obj, dict) else obj
+
+    rows = {}
+    models = {}
+    for label, path, load in (('original', original_path, load_original),
+                              ('compact', compact_path, lambda: FlatForest.load(compact_path))):
+        model, load_seconds, load_peak = _timed_load(load)
+        batch, single = _timed_inference(model, X)
+        models[label] = model
+        rows[label] = {
+            'size_bytes': os.path.getsize(path),
+            'load_ms': load_seconds * 1000,
+            'load_peak_bytes': load_peak,
+            'batch_ms': batch * 1000,
+            'row_ms': single * 1000
+        }
+
+    deviation = np.abs(models['original'].predict_proba(X)[:, 1] - models['compact'].predict_proba(X)[:, 1]).max()
+    agreement = (models['original'].predict(X) == models['compact'].predict(X)).mean()
+    return rows, float(deviation), float(agreement)
+
+
+def probe_rows(handler, n=PROBE_ROWS, seed=0):
+    """Synthetic inputs drawn around the scaler's training mean/scale, preprocessed for the forest."""
+    rng = np.random.default_rng(seed)
+    raw = handler.scaler.mean_ + rng.standard_normal((n, len(handler.scaler.mean_))) * handler.scaler.scale_
+    return handler.preprocess_batch(raw)
+
+
+def init_app(app):
+    @app.cli.command('compact-model')
+    @click.option('--model', 'model_name', default='Random Forest', show_default=True)
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Defaults to <artifact>.compact.npz next to the original.')
+    @click.option('--validation', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='Labeled CSV used to choose the tree count and check deviation.')
+    @click.option('--label-column', default='Heart Disease', show_default=True)
+    @click.option('--max-deviation', type=float, default=0.0, show_default=True,
+                  help='Largest allowed change in predicted probability. 0 keeps every tree (lossless).')
+    def compact_model_command(model_name, output, validation, label_column, max_deviation):
+        """Write a slim serving copy of a Random Forest artifact and compare it with the original."""
+        from .evaluation import load_dataset
+
+        model = model_handler.models.get(model_name)
+        if model is None or not (hasattr(model, 'estimators_') or isinstance(model, FlatForest)):
+            raise click.ClickException(f"'{model_name}' is not a loaded forest model")
+        original_path = model_handler.models_config[model_name]
+        output = output or os.path.splitext(original_path)[0] + '.compact.npz'
+
+        X_val = y_val = None
+        X_probe = probe_rows(model_handler)
+        if validation:
+            X_raw, y_val = load_dataset(validation, model_handler.feature_names(), label_column)
+            # Probe rows cover inputs a small validation set never reaches, so merged nodes are checked there too
+            X_val = np.vstack([model_handler.preprocess_batch(X_raw), X_probe])
+        elif max_deviation > 0:
+            raise click.ClickException('--max-deviation needs a --validation dataset to choose trees against')
+
+        compact, info = compact_forest(model, X_val, y_val, max_deviation)
+        compact.save(output)
+
+        X_check = X_val if X_val is not None else X_probe
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows, deviation, agreement = benchmark(original_path, output, X_check)
+
+        limit = max(max_deviation, FLOAT32_PROB_TOLERANCE)
+        if deviation > limit:
+            os.remove(output)
+            raise click.ClickException(f"Compacted model deviates by {deviation:.2e} (limit {limit:.2e}); nothing written")
+
+        click.echo(f"Trees {info['trees_before']} -> {info['trees_after']}, nodes {info['nodes_before']} -> "
+                   f"{info['nodes_after_merge']} (identical leaves merged) -> {info['nodes_after']} "
+                   f"(trees dropped, nodes pruned), max depth {info['max_depth']}")
+        click.echo(f"{'':10s} {'size':>10s} {'load':>9s} {'load mem':>10s} {'batch':>9s} {'per row':>9s}")
+        for label, row in rows.items():
+            click.echo(f"{label:10s} {row['size_bytes'] / 1024:8.1f}KB {row['load_ms']:7.2f}ms "
+                       f"{row['load_peak_bytes'] / 1024:8.1f}KB {row['batch_ms']:7.2f}ms {row['row_ms']:7.3f}ms")
+        checked = f"{len(y_val)} validation + {len(X_probe)} probe" if validation else f"{len(X_check)} probe"
+        click.echo(f"Max probability deviation measured on {checked} rows: "
+                   f"{deviation:.2e} (limit {limit:.2e}), label agreement {agreement:.2%}")
+        click.echo(f"Wrote {output}. Serve it with RF_MODEL_PATH={output}")
@@ -1,6 +1,40 @@
 import os
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-change-me-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Prediction retention: rows older than this are moved to the Parquet archive
+    PREDICTION_RETENTION_DAYS = int(os.environ.get('PREDICTION_RETENTION_DAYS') or 365)
+    PREDICTION_ARCHIVE_DIR = os.environ.get('PREDICTION_ARCHIVE_DIR') or os.path.join(PROJECT_ROOT, 'archive', 'predictions')
+
+    # Feature drift monitor: workers fold their stats into one file per day every N predictions;
+    # the report covers the last DRIFT_WINDOW_DAYS days
+    DRIFT_SNAPSHOT_DIR = os.environ.get('DRIFT_SNAPSHOT_DIR') or os.path.join(PROJECT_ROOT, 'drift')
+    DRIFT_SNAPSHOT_EVERY = int(os.environ.get('DRIFT_SNAPSHOT_EVERY') or 25)
+    DRIFT_WINDOW_DAYS = int(os.environ.get('DRIFT_WINDOW_DAYS') or 7)
+
+    # Serve the hashed files from static/dist (built by `flask build-assets`) when a manifest exists
+    ASSETS_USE_MANIFEST = True
+
+    # Appointment scheduling: every appointment holds one slot of this length; free slots are offered within clinic hours
+    APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES') or 30)
+    CLINIC_OPEN_HOUR = int(os.environ.get('CLINIC_OPEN_HOUR') or 8)
+    CLINIC_CLOSE_HOUR = int(os.environ.get('CLINIC_CLOSE_HOUR') or 17)
+    CLINIC_WORKING_DAYS = (0, 1, 2, 3, 4)  # Monday-Friday
+
+    # Live updates (/events): each open stream holds one server thread for as long as the page is open.
+    # WEB_THREADS must match gunicorn --threads; streams get at most SSE_MAX_STREAMS of them per worker
+    WEB_THREADS = int(os.environ.get('WEB_THREADS') or 100)
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS') or WEB_THREADS // 2)
+
+    # Response cache for the dashboard/report pages: 'memory' (per worker), 'sqlite' (shared by workers on a host) or 'none'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or os.path.join(PROJECT_ROOT, '.cache', 'responses.sqlite')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT') or 300)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 512)
+    # Deploy identifier in every cache key, so a persistent cache never serves another deploy's pages
+    BUILD_ID = os.environ.get('BUILD_ID') or os.environ.get('RENDER_GIT_COMMIT') or ''
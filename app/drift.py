@@ -0,0 +1,367 @@
+import os
+import json
+import glob
+import time
+import atexit
+import datetime
+import threading
+import contextlib
+import click
+import numpy as np
+from flask import current_app
+
+# Histogram layout: HIST_BINS equal-width bins over mean +/- HIST_RANGE std (from the scaler),
+# plus one underflow and one overflow bin
+HIST_BINS = 16
+HIST_RANGE = 4.0
+
+# Drift thresholds
+MIN_SAMPLES = 30         # no verdict before this many live predictions
+MEAN_SHIFT_LIMIT = 0.5   # |live mean - training mean| in training std units
+VARIANCE_RATIO_LIMITS = (0.5, 2.0)
+
+# Cross-process lock on the snapshot directory: give up after LOCK_WAIT seconds
+# and break locks older than LOCK_STALE seconds (left by a process that died holding one)
+LOCK_WAIT = 2.0
+LOCK_STALE = 30.0
+
+
+class RunningStats:
+    """
+    Welford mean/variance per column plus fixed-bin histograms.
+    Memory does not depend on how many rows have been seen.
+    """
+    def __init__(self, n_columns, edges=None):
+        self.n = 0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.edges = edges
+        self.hist = np.zeros((n_columns, edges.shape[1] + 1), dtype=np.int64) if edges is not None else None
+
+    def update(self, row):
+        self.n += 1
+        delta = row - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (row - self.mean)
+        if self.hist is not None:
+            bins = (row[:, None] >= self.edges).sum(axis=1)
+            self.hist[np.arange(len(row)), bins] += 1
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.zeros_like(self.m2)
+
+    def merge(self, other):
+        """Combine with another partial result (Chan et al. parallel update)."""
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.n / n
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.n * other.n / n
+        self.n = n
+        if self.hist is not None and other.hist is not None:
+            self.hist = self.hist + other.hist
+
+    def to_dict(self):
+        data = {'n': self.n, 'mean': self.mean.tolist(), 'm2': self.m2.tolist()}
+        if self.hist is not None:
+            data['hist'] = self.hist.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data, edges=None):
+        stats = cls(len(data['mean']), edges if 'hist' in data else None)
+        stats.n = data['n']
+        stats.mean = np.array(data['mean'], dtype=float)
+        stats.m2 = np.array(data['m2'], dtype=float)
+        if 'hist' in data and edges is not None:
+            stats.hist = np.array(data['hist'], dtype=np.int64)
+        return stats
+
+
+class DriftMonitor:
+    """
+    Online view of the live input population, fed from ModelHandler.preprocess.
+    Keeps running stats for the 9 raw inputs and the PCA components. Every
+    snapshot folds what this process collected since the last one into a
+    shared file for the day it was collected on (drift-YYYY-MM-DD.json), so
+    workers and restarts add no files, and the report covers the last
+    window_days days without touching the Prediction table. Snapshots are
+    written by a background thread, so a prediction never waits on the
+    file lock or the disk.
+    """
+    def __init__(self, scaler, pca, snapshot_dir, snapshot_every=25, snapshot_interval=60, window_days=7):
+        self.scaler = scaler
+        self.pca = pca
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.window_days = window_days
+        self.lock_path = os.path.join(snapshot_dir, '.drift.lock')
+
+        self.edges = self.bin_edges(scaler)
+        # Stats not yet folded into the day files: day -> (features, components)
+        self._unsaved = {}
+        self._count = 0
+
+        self._lock = threading.Lock()
+        # Held while day files are written, so merged() never counts a row both on disk and in memory
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+
+    @staticmethod
+    def bin_edges(scaler):
+        steps = np.linspace(-HIST_RANGE, HIST_RANGE, HIST_BINS + 1)
+        return scaler.mean_[:, None] + scaler.scale_[:, None] * steps[None, :]
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.utcnow().date()
+
+    def _new_stats(self):
+        features = RunningStats(len(self.scaler.mean_), self.edges)
+        components = RunningStats(self.pca.n_components_) if self.pca is not None else None
+        return features, components
+
+    def _day_path(self, day):
+        return os.path.join(self.snapshot_dir, f"drift-{day.isoformat()}.json")
+
+    def _window(self):
+        today = self._today()
+        return [today - datetime.timedelta(days=i) for i in range(self.window_days)]
+
+    def update(self, features_array, features_pca=None):
+        self._start_writer()
+        with self._lock:
+            day = self._today()
+            if day not in self._unsaved:
+                self._unsaved[day] = self._new_stats()
+            features, components = self._unsaved[day]
+            for i, row in enumerate(np.asarray(features_array, dtype=float)):
+                features.update(row)
+                if components is not None and features_pca is not None:
+                    components.update(np.asarray(features_pca[i], dtype=float))
+            self._count += len(features_array)
+            due = self._count >= self.snapshot_every
+        if due:
+            self._wake.set()
+
+    def _start_writer(self):
+        # Started on first use, so each (forked) worker process gets its own thread
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='drift-snapshot', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        """Snapshot every snapshot_interval seconds, or sooner when update() has collected snapshot_every rows."""
+        while True:
+            self._wake.wait(self.snapshot_interval)
+            self._wake.clear()
+            self.snapshot()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Lock file created with O_EXCL; yields False when it could not be taken in time."""
+        deadline = time.monotonic() + LOCK_WAIT
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            os.close(fd)
+            os.remove(self.lock_path)
+
+    def _read(self, day):
+        features, components = self._new_stats()
+        try:
+            with open(self._day_path(day)) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return features, components
+        except (OSError, ValueError) as e:
+            print(f"Error reading drift snapshot for {day}: {e}")
+            return features, components
+        features.merge(RunningStats.from_dict(state['features'], self.edges))
+        if components is not None and state.get('components'):
+            components.merge(RunningStats.from_dict(state['components']))
+        return features, components
+
+    def _prune(self):
+        """Remove snapshot files outside the window (including the old per-process layout)."""
+        keep = {os.path.basename(self._day_path(day)) for day in self._window()}
+        for path in glob.glob(os.path.join(self.snapshot_dir, 'drift-*.json')):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+    def snapshot(self):
+        """Fold the stats collected since the last snapshot into the shared files for their days."""
+        with self._write_lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        with self._lock:
+            unsaved, self._unsaved, self._count = self._unsaved, {}, 0
+        if not unsaved:
+            return
+
+        failed = {}
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with self._file_lock() as locked:
+                if locked:
+                    for day, (features, components) in unsaved.items():
+                        try:
+                            self._write(day, features, components)
+                        except OSError as e:
+                            print(f"Error writing drift snapshot for {day}: {e}")
+                            failed[day] = (features, components)
+                    self._prune()
+                else:
+                    failed = unsaved
+        except OSError as e:
+            print(f"Error writing drift snapshot: {e}")
+            failed = unsaved
+
+        # Not written: keep the stats in memory so the next snapshot retries them
+        with self._lock:
+            for day, (features, components) in failed.items():
+                self._count += features.n
+                if day in self._unsaved:
+                    features.merge(self._unsaved[day][0])
+                    if components is not None:
+                        components.merge(self._unsaved[day][1])
+                self._unsaved[day] = (features, components)
+
+    def _write(self, day, features, components):
+        """Merge one day's stats into its file; call with the file lock held."""
+        stored_features, stored_components = self._read(day)
+        stored_features.merge(features)
+        if stored_components is not None:
+            stored_components.merge(components)
+        state = {
+            'features': stored_features.to_dict(),
+            'components': stored_components.to_dict() if stored_components is not None else None,
+            'updated_at': time.time()
+        }
+        # Atomic replace, so readers never see half a file
+        path = self._day_path(day)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+    def merged(self):
+        """Stats for the last window_days days: the day files plus this process's unsaved numbers."""
+        features, components = self._new_stats()
+        window = self._window()
+        with self._write_lock:
+            for day in window:
+                day_features, day_components = self._read(day)
+                features.merge(day_features)
+                if components is not None:
+                    components.merge(day_components)
+            with self._lock:
+                for day, (day_features, day_components) in self._unsaved.items():
+                    if day in window:
+                        features.merge(day_features)
+                        if components is not None:
+                            components.merge(day_components)
+        return features, components
+
+    def report(self, feature_names):
+        """Compare live stats against the scaler's mean_/scale_ and the PCA explained variance."""
+        features, components = self.merged()
+        enough = features.n >= MIN_SAMPLES
+        low, high = VARIANCE_RATIO_LIMITS
+
+        mean_shift = (features.mean - self.scaler.mean_) / self.scaler.scale_
+        variance_ratio = features.variance / self.scaler.scale_ ** 2
+        feature_rows = []
+        for i, name in enumerate(feature_names):
+            drifted = enough and (abs(mean_shift[i]) > MEAN_SHIFT_LIMIT or not low <= variance_ratio[i] <= high)
+            feature_rows.append({
+                'feature': name,
+                'live_mean': float(features.mean[i]),
+                'training_mean': float(self.scaler.mean_[i]),
+                'mean_shift': float(mean_shift[i]),
+                'variance_ratio': float(variance_ratio[i]),
+                'histogram': features.hist[i].tolist(),
+                'bin_edges': self.edges[i].tolist(),
+                'drifted': bool(drifted)
+            })
+
+        component_rows = []
+        if components is not None:
+            ratio = components.variance / self.pca.explained_variance_
+            for k in range(len(ratio)):
+                component_rows.append({
+                    'component': f"PC{k + 1}",
+                    'live_variance': float(components.variance[k]),
+                    'training_variance': float(self.pca.explained_variance_[k]),
+                    'variance_ratio': float(ratio[k]),
+                    'drifted': bool(enough and not low <= ratio[k] <= high)
+                })
+
+        return {
+            'samples': int(features.n),
+            'window_days': self.window_days,
+            'enough_samples': bool(enough),
+            'drift_detected': any(r['drifted'] for r in feature_rows + component_rows),
+            'features': feature_rows,
+            'components': component_rows
+        }
+
+    def reset(self):
+        with self._lock:
+            self._unsaved, self._count = {}, 0
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with self._file_lock():
+            for path in glob.glob(os.path.join(self.snapshot_dir, 'drift-*.json')):
+                os.remove(path)
+
+
+def drift_report():
+    """Report for the current app, or None when the monitor is not running."""
+    from .ml_utils import model_handler
+    monitor = model_handler.drift_monitor
+    if monitor is None:
+        return None
+    return monitor.report(model_handler.feature_names())
+
+
+def init_app(app):
+    from .ml_utils import model_handler
+
+    if model_handler.scaler is None:
+        print("Warning: drift monitor disabled (scaler not loaded)")
+    elif model_handler.drift_monitor is None:
+        monitor = DriftMonitor(model_handler.scaler, model_handler.pca,
+                               app.config['DRIFT_SNAPSHOT_DIR'],
+                               snapshot_every=app.config['DRIFT_SNAPSHOT_EVERY'],
+                               window_days=app.config['DRIFT_WINDOW_DAYS'])
+        model_handler.drift_monitor = monitor
+        atexit.register(monitor.snapshot)
+
+    @app.cli.command('drift-reset')
+    def drift_reset_command():
+        """Forget collected drift statistics (e.g. after retraining)."""
+        if model_handler.drift_monitor is not None:
+            model_handler.drift_monitor.reset()
+        click.echo(f"Drift snapshots cleared in {current_app.config['DRIFT_SNAPSHOT_DIR']}")
@@ -0,0 +1,222 @@
+import os
+import io
+import json
+import time
+import hashlib
+import datetime
+import contextlib
+import click
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from .config import PROJECT_ROOT
+from .ml_utils import model_handler, SCALER_PATH, PCA_PATH
+
+# Bump when the layout of the metrics.json files changes
+METRICS_SCHEMA_VERSION = 1
+
+# Cached predictions, keyed by artifact + preprocessing + dataset hashes
+EVAL_CACHE_DIR = os.path.join(PROJECT_ROOT, '.eval_cache')
+
+# Rows timed one at a time through ModelHandler.predict for the latency figures
+LATENCY_SAMPLE = 200
+
+# Label spellings accepted in the dataset's target column
+POSITIVE_LABELS = {'1', 'presence', 'present', 'yes', 'true', 'heart disease detected'}
+NEGATIVE_LABELS = {'0', 'absence', 'absent', 'no', 'false', 'no heart disease'}
+
+# Metric names as shown on the compare_models page
+METRIC_NAMES = ['Accuracy', 'Precision', 'Recall', 'F1 Score', 'ROC AUC']
+
+_metrics_cache = {}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def metrics_path(artifact_path):
+    """heart_model.pkl -> heart_model.metrics.json (next to the artifact)."""
+    return os.path.splitext(artifact_path)[0] + '.metrics.json'
+
+
+def load_dataset(path, feature_names, label_column):
+    """
+    Read a labeled CSV. Feature columns are matched to the model's 9 inputs by
+    name (case-insensitive); labels may be 0/1 or Presence/Absence style strings.
+    """
+    df = pd.read_csv(path)
+    columns = {c.strip().lower(): c for c in df.columns}
+
+    missing = [name for name in feature_names if name.lower() not in columns]
+    if missing:
+        raise ValueError(f"Dataset is missing feature columns: {missing}")
+    if label_column.lower() not in columns:
+        raise ValueError(f"Dataset has no label column '{label_column}'")
+
+    X = df[[columns[name.lower()] for name in feature_names]].to_numpy(dtype=float)
+
+    labels = df[columns[label_column.lower()]].astype(str).str.strip().str.lower()
+    unknown = set(labels) - POSITIVE_LABELS - NEGATIVE_LABELS
+    if unknown:
+        raise ValueError(f"Unrecognised labels in '{label_column}': {sorted(unknown)[:5]}")
+    y = labels.isin(POSITIVE_LABELS).to_numpy(dtype=int)
+    return X, y
+
+
+def _cache_file(*hashes):
+    return os.path.join(EVAL_CACHE_DIR, '-'.join(h[:16] for h in hashes) + '.npz')
+
+
+def _score_model(handler, model_name, X):
+    """Batch predictions plus per-row latency and batch throughput."""
+    start = time.perf_counter()
+    prob, pred = handler.predict_batch(model_name, X)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    # predict() prints debug lines per call; keep them out of the timings.
+    # track=False keeps offline rows out of the live drift statistics.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for row in X[:LATENCY_SAMPLE]:
+            t0 = time.perf_counter()
+            handler.predict(model_name, row.tolist(), track=False)
+            latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1000
+
+    performance = {
+        'batch_rows': int(len(X)),
+        'batch_seconds': batch_seconds,
+        'throughput_rows_per_sec': len(X) / batch_seconds if batch_seconds > 0 else None,
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95)),
+        'latency_ms_mean': float(latencies.mean())
+    }
+    return prob, pred, performance
+
+
+def compute_metrics(y, prob, pred):
+    metrics = {
+        'Accuracy': accuracy_score(y, pred),
+        'Precision': precision_score(y, pred, zero_division=0),
+        'Recall': recall_score(y, pred, zero_division=0),
+        'F1 Score': f1_score(y, pred, zero_division=0),
+        # ROC AUC is undefined when the dataset holds a single class
+        'ROC AUC': roc_auc_score(y, prob) if len(np.unique(y)) == 2 else None
+    }
+    return {k: (float(v) if v is not None else None) for k, v in metrics.items()}
+
+
+def evaluate(handler, dataset_path, label_column='Heart Disease', model_names=None, use_cache=True):
+    """
+    Score a labeled dataset through each model and write <artifact>.metrics.json.
+    Predictions are cached per (artifact, scaler, PCA, dataset) hash, so rerunning
+    against unchanged files skips inference entirely. Returns {model: metrics document}.
+    """
+    X, y = load_dataset(dataset_path, handler.feature_names(), label_column)
+    dataset_hash = file_sha256(dataset_path)
+    preprocessing = {name: file_sha256(path) for name, path in (('scaler', SCALER_PATH), ('pca', PCA_PATH))
+                     if path and os.path.exists(path)}
+
+    unknown = [name for name in model_names or [] if name not in handler.models_config]
+    if unknown:
+        raise ValueError(f"Unknown model(s): {', '.join(unknown)} (expected one of {', '.join(handler.models_config)})")
+
+    results = {}
+    for model_name in model_names or list(handler.models_config):
+        artifact = handler.models_config[model_name]
+        if handler.models.get(model_name) is None:
+            print(f"Skipping {model_name}: model not loaded")
+            continue
+
+        artifact_hash = file_sha256(artifact)
+        cache_file = _cache_file(artifact_hash, *preprocessing.values(), dataset_hash)
+
+        if use_cache and os.path.exists(cache_file):
+            cached = np.load(cache_file)
+            prob, pred = cached['prob'], cached['pred']
+            performance = json.loads(str(cached['performance']))
+            from_cache = True
+        else:
+            prob, pred, performance = _score_model(handler, model_name, X)
+            os.makedirs(EVAL_CACHE_DIR, exist_ok=True)
+            np.savez_compressed(cache_file, prob=prob, pred=pred, performance=json.dumps(performance))
+            from_cache = False
+
+        document = {
+            'schema_version': METRICS_SCHEMA_VERSION,
+            'model': model_name,
+            'artifact': os.path.basename(artifact),
+            'artifact_sha256': artifact_hash,
+            'preprocessing_sha256': preprocessing,
+            'dataset': {
+                'path': os.path.abspath(dataset_path),
+                'sha256': dataset_hash,
+                'rows': int(len(y)),
+                'positives': int(y.sum())
+            },
+            'evaluated_at': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'from_cache': from_cache,
+            'metrics': compute_metrics(y, prob, pred),
+            'performance': performance
+        }
+        with open(metrics_path(artifact), 'w') as f:
+            json.dump(document, f, indent=2)
+        results[model_name] = document
+    return results
+
+
+def load_training_metrics(models_config):
+    """
+    {model name: metrics dict} from each artifact's metrics.json, for the
+    compare_models page. Files are re-read only when they change; models
+    whose metrics file is missing, stale or unreadable are left out.
+    """
+    training_metrics = {}
+    for model_name, artifact in models_config.items():
+        path = metrics_path(artifact)
+        try:
+            mtime = os.path.getmtime(path)
+            artifact_mtime = os.path.getmtime(artifact)
+        except OSError:
+            continue
+
+        cached = _metrics_cache.get(path)
+        if cached is None or cached[0] != (mtime, artifact_mtime):
+            try:
+                with open(path) as f:
+                    document = json.load(f)
+                # Only trust metrics produced from the artifact that is deployed now
+                if document.get('artifact_sha256') != file_sha256(artifact):
+                    document = None
+            except (OSError, ValueError):
+                document = None
+            cached = ((mtime, artifact_mtime), document)
+            _metrics_cache[path] = cached
+
+        if cached[1] is not None:
+            training_metrics[model_name] = cached[1]['metrics']
+    return training_metrics
+
+
+def init_app(app):
+    @app.cli.command('evaluate-models')
+    @click.argument('dataset', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--label-column', default='Heart Disease', show_default=True, help='Name of the 0/1 or Presence/Absence column.')
+    @click.option('--model', 'model_names', multiple=True, type=click.Choice(list(model_handler.models_config)),
+                  help='Model to evaluate (repeatable). Defaults to all.')
+    @click.option('--no-cache', is_flag=True, help='Ignore cached predictions and re-run inference.')
+    def evaluate_models_command(dataset, label_column, model_names, no_cache):
+        """Score a labeled dataset through the models and write metrics.json files."""
+        results = evaluate(model_handler, dataset, label_column, list(model_names) or None, use_cache=not no_cache)
+        for model_name, document in results.items():
+            metrics = ', '.join(f"{k} {v:.3f}" for k, v in document['metrics'].items() if v is not None)
+            perf = document['performance']
+            source = 'cached predictions' if document['from_cache'] else 'fresh inference'
+            click.echo(f"{model_name}: {metrics}")
+            click.echo(f"  {perf['throughput_rows_per_sec']:.0f} rows/s batch, p50 {perf['latency_ms_p50']:.2f} ms/row ({source})")
+            click.echo(f"  -> {metrics_path(model_handler.models_config[model_name])}")
@@ -0,0 +1,157 @@
+import json
+import queue
+import itertools
+import threading
+
+# Events a slow viewer may fall behind by before it is disconnected (the browser reconnects)
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments, so proxies do not close idle streams
+HEARTBEAT_SECONDS = 15
+
+# Seconds a browser turned away by the stream limit waits before reloading the page
+STREAM_RETRY_SECONDS = 60
+
+# Sent to a subscriber queue to end its stream
+_CLOSE = object()
+
+
+class StreamLimitReached(RuntimeError):
+    """Every live-update slot of this process is taken."""
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe for Server-Sent Events. Every open stream owns
+    a bounded queue; publish() fans an event out to all of them without
+    blocking the request that published it. Events only reach viewers connected
+    to the same process. Each stream holds a server thread for as long as the
+    page is open, so at most max_subscribers are accepted (None: no limit).
+    """
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, max_subscribers=None):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def configure(self, max_subscribers):
+        self.max_subscribers = max_subscribers
+
+    def subscribe(self):
+        """New subscriber queue; raises StreamLimitReached when every slot is taken."""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                raise StreamLimitReached(f"{len(self._subscribers)} live streams already open")
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        message = format_event(event_type, data, next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Viewer stopped reading: drop it rather than buffer without bound
+                self.unsubscribe(q)
+                _close(q)
+
+    def close_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for q in subscribers:
+            _close(q)
+
+    def stream(self, q=None, heartbeat=HEARTBEAT_SECONDS):
+        """
+        Generator of SSE text for one viewer; unsubscribes when the client goes
+        away. Pass a queue from subscribe() to claim the slot before the
+        response starts.
+        """
+        if q is None:
+            q = self.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is _CLOSE:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(q)
+
+
+def _close(q):
+    # Make room for the close marker if the queue is full
+    while True:
+        try:
+            q.put_nowait(_CLOSE)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def format_event(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def prediction_event(prediction):
+    return {
+        'id': prediction.id,
+        'patient_id': prediction.patient_id,
+        'patient_name': prediction.patient.full_name if prediction.patient else None,
+        'result': prediction.prediction_result,
+        'probability': prediction.probability_score,
+        'model': prediction.model_used,
+        'created_at': prediction.created_at.strftime('%Y-%m-%d %H:%M') if prediction.created_at else None,
+        'high_risk': prediction.prediction_result == 'Heart Disease Detected'
+    }
+
+
+def publish_prediction(prediction):
+    """Publish 'prediction' (and 'high_risk' for positive results) after the row is committed."""
+    data = prediction_event(prediction)
+    broker.publish('prediction', data)
+    if data['high_risk']:
+        broker.publish('high_risk', data)
+
+
+def publish_appointment_status(appointment):
+    broker.publish('appointment_status', {
+        'id': appointment.id,
+        'status': appointment.status,
+        'patient_name': appointment.patient.full_name if appointment.patient else None,
+        'doctor_name': appointment.doctor.full_name if appointment.doctor else None,
+        'appointment_date': appointment.appointment_date.strftime('%Y-%m-%d %H:%M') if appointment.appointment_date else None
+    })
+
+
+broker = EventBroker()
+
+
+def init_app(app):
+    broker.configure(app.config['SSE_MAX_STREAMS'])
@@ -1,10 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify, Response
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import joinedload
 from . import db
-from .models import Patient, Prediction, User, Appointment
+from .models import Patient, Prediction, PredictionExplanation, User, Appointment
 from .ml_utils import model_handler
+from . import archive
+from . import drift
+from . import evaluation
+from . import events
+from .scheduling import scheduler, appointments_between, SlotConflict
+from .cache import response_cache, PREDICTIONS, PATIENTS, APPOINTMENTS, USERS
 import datetime
+import json
 
 main = Blueprint('main', __name__)
 
@@ -16,15 +24,41 @@ def index():
 
 @main.route('/dashboard')
 @login_required
+@response_cache.cached(PREDICTIONS, PATIENTS, USERS)
 def dashboard():
-    stats = {
+    # Counts are shared by every user of the role; only the page around them is rendered per user
+    stats = response_cache.fragment('dashboard.stats', (PREDICTIONS, PATIENTS, USERS), lambda: {
         'total_patients': Patient.query.count(),
-        'total_predictions': Prediction.query.count(),
+        'total_predictions': Prediction.query.count() + archive.archived_total(),
         'staff_count': User.query.count(),
-        'high_risk_count': Prediction.query.filter_by(prediction_result="Heart Disease Detected").count(),
-        'recent_predictions': Prediction.query.order_by(Prediction.created_at.desc()).limit(5).all()
-    }
-    return render_template('dashboard/index.html', stats=stats)
+        'high_risk_count': Prediction.query.filter_by(prediction_result="Heart Disease Detected").count() + archive.archived_total("Heart Disease Detected")
+    })
+    stats['recent_predictions'] = Prediction.query.order_by(Prediction.created_at.desc()).limit(5).all()
+    return render_template('dashboard/index.html', stats=stats, drift=drift.drift_report())
+
+@main.route('/metrics/drift')
+@login_required
+def drift_metrics():
+    report = drift.drift_report()
+    if report is None:
+        return jsonify({'error': 'Drift monitor not running'}), 503
+    return jsonify(report)
+
+@main.route('/events')
+@login_required
+def event_stream():
+    # Long-lived response: one thread per open dashboard, so run gunicorn with threaded workers
+    try:
+        q = events.broker.subscribe()
+    except events.StreamLimitReached:
+        # Leave the remaining threads to normal requests; the page falls back to reloading
+        return Response(f"retry: {events.STREAM_RETRY_SECONDS * 1000}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(events.STREAM_RETRY_SECONDS), 'Cache-Control': 'no-cache'})
+    response = Response(events.broker.stream(q), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Frees the slot even if the client leaves before the stream starts
+    response.call_on_close(lambda: events.broker.unsubscribe(q))
+    return response
 
 @main.route('/patients')
 @login_required
@@ -36,11 +70,17 @@ def patients():
         patients = Patient.query.all()
     return render_template('dashboard/patients.html', patients=patients)
 
+def patient_predictions(patient):
+    # Live rows (with their explanations) plus anything already moved to the Parquet archive, newest first
+    live = Prediction.query.options(joinedload(Prediction.explanation)).filter_by(patient_id=patient.id).all()
+    predictions = live + archive.query_archive(patient_ids=[patient.id])
+    return sorted(predictions, key=lambda p: p.created_at, reverse=True)
+
 @main.route('/patient/<int:patient_id>')
 @login_required
 def patient_details(patient_id):
     patient = Patient.query.get_or_404(patient_id)
-    predictions = Prediction.query.filter_by(patient_id=patient.id).order_by(Prediction.created_at.desc()).all()
+    predictions = patient_predictions(patient)
     return render_template('dashboard/patient_details.html', patient=patient, predictions=predictions)
 
 @main.route('/add_patient', methods=['POST'])
@@ -55,6 +95,7 @@ def add_patient():
     )
     db.session.add(new_patient)
     db.session.commit()
+    response_cache.bump(PATIENTS)
     flash('Patient added successfully!', 'success')
     return redirect(url_for('main.patients'))
 
@@ -70,6 +111,7 @@ def edit_patient(patient_id):
         patient.medical_history = request.form['medical_history']
         
         db.session.commit()
+        response_cache.bump(PATIENTS)
         flash('Patient details updated successfully.', 'success')
         return redirect(url_for('main.patients'))
         
@@ -107,7 +149,7 @@ def predict():
                 comparison_results = []
                 
                 # Run for Logistic Regression
-                res_lr, prob_lr = model_handler.predict('Logistic Regression', input_features)
+                res_lr, prob_lr, expl_lr = model_handler.predict_with_explanation('Logistic Regression', input_features)
                 pred_lr = Prediction(
                     patient_id=request.form['patient_id'],
                     prediction_result=res_lr,
@@ -116,10 +158,12 @@ def predict():
                     input_data=str(input_features)
                 )
                 db.session.add(pred_lr)
-                comparison_results.append({'model': 'Logistic Regression', 'result': res_lr, 'probability': prob_lr})
+                if expl_lr:
+                    db.session.add(PredictionExplanation(prediction=pred_lr, payload=json.dumps(expl_lr)))
+                comparison_results.append({'model': 'Logistic Regression', 'result': res_lr, 'probability': prob_lr, 'explanation': expl_lr})
                 
-                # Run for Random Forest
-                res_rf, prob_rf = model_handler.predict('Random Forest', input_features)
+                # Run for Random Forest (same inputs, already counted by the drift monitor)
+                res_rf, prob_rf, expl_rf = model_handler.predict_with_explanation('Random Forest', input_features, track=False)
                 pred_rf = Prediction(
                     patient_id=request.form['patient_id'],
                     prediction_result=res_rf,
@@ -128,15 +172,20 @@ def predict():
                     input_data=str(input_features)
                 )
                 db.session.add(pred_rf)
-                comparison_results.append({'model': 'Random Forest', 'result': res_rf, 'probability': prob_rf})
+                if expl_rf:
+                    db.session.add(PredictionExplanation(prediction=pred_rf, payload=json.dumps(expl_rf)))
+                comparison_results.append({'model': 'Random Forest', 'result': res_rf, 'probability': prob_rf, 'explanation': expl_rf})
                 
                 db.session.commit()
+                response_cache.bump(PREDICTIONS)
+                events.publish_prediction(pred_lr)
+                events.publish_prediction(pred_rf)
                 flash('Dual Model Prediction Complete', 'success')
                 return render_template('dashboard/prediction_result.html', comparison=comparison_results, patient_id=request.form['patient_id'])
             
             else:
                 # Predict using single selected model
-                result_str, prob = model_handler.predict(selected_model, input_features)
+                result_str, prob, explanation = model_handler.predict_with_explanation(selected_model, input_features)
                 
                 new_pred = Prediction(
                     patient_id=request.form['patient_id'],
@@ -146,10 +195,14 @@ def predict():
                     input_data=str(input_features)
                 )
                 db.session.add(new_pred)
+                if explanation:
+                    db.session.add(PredictionExplanation(prediction=new_pred, payload=json.dumps(explanation)))
                 db.session.commit()
+                response_cache.bump(PREDICTIONS)
+                events.publish_prediction(new_pred)
                 
                 flash(f'Prediction Complete: {result_str}', 'success')
-                return render_template('dashboard/prediction_result.html', result=result_str, probability=prob, patient_id=request.form['patient_id'], model=selected_model)
+                return render_template('dashboard/prediction_result.html', result=result_str, probability=prob, patient_id=request.form['patient_id'], model=selected_model, explanation=explanation)
             
         except Exception as e:
             flash(f'Error during prediction: {e}', 'danger')
@@ -163,10 +216,39 @@ def predict():
 @main.route('/appointments')
 @login_required
 def appointments():
-    appointments = Appointment.query.all()
+    # Date-range scoped listing (default: today and the next 14 days)
+    today = datetime.date.today()
+    try:
+        start = datetime.datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else today
+        end = datetime.datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else start + datetime.timedelta(days=14)
+    except ValueError:
+        flash('Invalid date range.', 'warning')
+        start, end = today, today + datetime.timedelta(days=14)
+    doctor_id = request.args.get('doctor_id', type=int)
+
+    appointments = appointments_between(start, end + datetime.timedelta(days=1), doctor_id)
     doctors = User.query.filter_by(role='Doctor').all()
-    patients = Patient.query.all()
-    return render_template('dashboard/appointments.html', appointments=appointments, doctors=doctors, patients=patients)
+    patients = db.session.query(Patient.id, Patient.full_name).order_by(Patient.full_name).all()
+    return render_template('dashboard/appointments.html', appointments=appointments, doctors=doctors, patients=patients,
+                           start=start, end=end, doctor_id=doctor_id)
+
+@main.route('/appointments/free_slots')
+@login_required
+def free_slots():
+    doctor_id = request.args.get('doctor_id', type=int)
+    if not doctor_id:
+        return jsonify({'error': 'doctor_id is required'}), 400
+    after = None
+    if request.args.get('date'):
+        try:
+            after = datetime.datetime.strptime(request.args['date'], '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+        after = max(after, datetime.datetime.now())
+    n = min(request.args.get('n', 5, type=int), 50)
+    slots = scheduler.next_free_slots(doctor_id, after, n)
+    return jsonify({'doctor_id': doctor_id, 'slot_minutes': int(scheduler.slot.total_seconds() // 60),
+                    'slots': [slot.strftime('%Y-%m-%d %H:%M') for slot in slots]})
 
 @main.route('/book_appointment', methods=['POST'])
 @login_required
@@ -177,17 +259,15 @@ def book_appointment():
         date_str = request.form.get('date') + " " + request.form.get('time')
         date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d %H:%M')
         
-        new_app = Appointment(
-            patient_id=patient_id,
-            doctor_id=doctor_id,
-            appointment_date=date_obj,
-            notes=request.form.get('notes'),
-            status='Pending'
-        )
-        db.session.add(new_app)
-        db.session.commit()
+        scheduler.book(patient_id, doctor_id, date_obj, notes=request.form.get('notes'))
+        response_cache.bump(APPOINTMENTS)
         flash('Appointment booked successfully.', 'success')
+    except SlotConflict as e:
+        db.session.rollback()
+        suggestions = ', '.join(slot.strftime('%a %d %b %H:%M') for slot in scheduler.next_free_slots(int(doctor_id), max(date_obj, datetime.datetime.now()), 3))
+        flash(f'Not booked: {e}.' + (f' Next free slots: {suggestions}.' if suggestions else ''), 'warning')
     except Exception as e:
+        db.session.rollback()
         flash(f'Error booking appointment: {e}', 'danger')
         
     return redirect(url_for('main.appointments'))
@@ -205,40 +285,50 @@ def users():
 
 @main.route('/compare_models')
 @login_required
+@response_cache.cached(PREDICTIONS)
 def compare_models():
     # Simple logic to compare model usage and positive rates
     # Group by model_used
     from sqlalchemy import func
     
-    # Count usage
-    usage_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).group_by(Prediction.model_used).all()
+    def count_usage():
+        # Count usage
+        usage_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).group_by(Prediction.model_used).all()
+        
+        # Count positive predictions per model
+        positive_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).filter_by(prediction_result='Heart Disease Detected').group_by(Prediction.model_used).all()
+        
+        # Initialize dicts (archived predictions are counted from the rollups)
+        usage_dict = archive.archived_counts_by_model()
+        positive_dict = archive.archived_counts_by_model('Heart Disease Detected')
+        for m, n in usage_stats:
+            usage_dict[m] = usage_dict.get(m, 0) + n
+        for m, n in positive_stats:
+            positive_dict[m] = positive_dict.get(m, 0) + n
+        # (model, count) pairs: a model name may be None, which JSON object keys cannot hold
+        return {'usage': list(usage_dict.items()), 'positive': list(positive_dict.items())}
     
-    # Count positive predictions per model
-    positive_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).filter_by(prediction_result='Heart Disease Detected').group_by(Prediction.model_used).all()
+    # Shared by every user of the role until a prediction is saved
+    counts = response_cache.fragment('compare_models.usage', (PREDICTIONS,), count_usage)
+    usage_dict = dict(counts['usage'])
+    positive_dict = dict(counts['positive'])
+    models = set(usage_dict)
     
     # Format for template
     labels = []
     usage_data = []
     positive_data = []
     
-    # Initialize dicts
-    models = set([s[0] for s in usage_stats])
-    usage_dict = {s[0]: s[1] for s in usage_stats}
-    positive_dict = {s[0]: s[1] for s in positive_stats}
-    
     for m in models:
         labels.append(m)
         usage_data.append(usage_dict.get(m, 0))
         positive_data.append(positive_dict.get(m, 0))
         
-    # Hardcoded training metrics (Simulated as they are not in the pickle)
-    # In a real scenario, these would be loaded from a 'metrics.json' file generated during training.
-    training_metrics = {
-        'Logistic Regression': {'Accuracy': 0.85, 'Precision': 0.84, 'Recall': 0.86, 'F1 Score': 0.85},
-        'Random Forest': {'Accuracy': 0.91, 'Precision': 0.90, 'Recall': 0.92, 'F1 Score': 0.91}
-    }
+    # Evaluation metrics from each artifact's metrics.json (written by `flask evaluate-models`)
+    training_metrics = evaluation.load_training_metrics(model_handler.models_config)
         
-    return render_template('dashboard/compare_models.html', labels=labels, usage_data=usage_data, positive_data=positive_data, training_metrics=training_metrics)
+    return render_template('dashboard/compare_models.html', labels=labels, usage_data=usage_data, positive_data=positive_data,
+                           training_metrics=training_metrics, metric_names=evaluation.METRIC_NAMES)
 
 @main.route('/history')
 @login_required
@@ -260,13 +350,23 @@ def history():
         query = query.filter(Prediction.model_used == model_used)
         
     date_filter = request.args.get('date_filter')
+    date_from = None
     if date_filter:
         # Simple date match, or maybe range?
         # Let's assume >= date provided
-        query = query.filter(Prediction.created_at >= datetime.datetime.strptime(date_filter, '%Y-%m-%d'))
+        date_from = datetime.datetime.strptime(date_filter, '%Y-%m-%d')
+        query = query.filter(Prediction.created_at >= date_from)
 
     # Order by newest
     predictions = query.order_by(Prediction.created_at.desc()).all()
+
+    # Older predictions live in the Parquet archive; pull them in when the date filter reaches back that far
+    if date_from and archive.reaches_archive(date_from):
+        patient_ids = None
+        if patient_name:
+            patient_ids = [p.id for p in Patient.query.filter(Patient.full_name.contains(patient_name)).all()]
+        archived = archive.query_archive(start=date_from, patient_ids=patient_ids, risk_status=risk_status, model_used=model_used)
+        predictions = sorted(predictions + archived, key=lambda p: p.created_at, reverse=True)
     
     # Export Check
     export_type = request.args.get('export')
@@ -358,14 +458,15 @@ def export_patient_predictions(patient_id):
     from flask import make_response
     
     patient = Patient.query.get_or_404(patient_id)
-    predictions = Prediction.query.filter_by(patient_id=patient.id).order_by(Prediction.created_at.desc()).all()
+    predictions = patient_predictions(patient)
     
     si = io.StringIO()
     cw = csv.writer(si)
-    cw.writerow(['Date', 'Result', 'Probability', 'Model Used', 'Input Data'])
+    cw.writerow(['Date', 'Result', 'Probability', 'Model Used', 'Input Data', 'Explanation'])
     
     for pred in predictions:
-        cw.writerow([pred.created_at, pred.prediction_result, pred.probability_score, pred.model_used, pred.input_data])
+        cw.writerow([pred.created_at, pred.prediction_result, pred.probability_score, pred.model_used, pred.input_data,
+                     pred.explanation.payload if pred.explanation else ''])
         
     output = make_response(si.getvalue())
     output.headers["Content-Disposition"] = f"attachment; filename=predictions_{patient.full_name}_{datetime.datetime.now().strftime('%Y%m%d')}.csv"
@@ -396,29 +497,37 @@ def settings():
     return render_template('dashboard/settings.html')
 @main.route('/reports')
 @login_required
+@response_cache.cached(PREDICTIONS, PATIENTS)
 def reports():
     from sqlalchemy import func
     
-    # Simple report aggregations
-    daily_predictions = Prediction.query.filter(Prediction.created_at >= datetime.date.today()).count()
-    total_high_risk = Prediction.query.filter_by(prediction_result='Heart Disease Detected').count()
-    total_patients = Patient.query.count()
+    def aggregate():
+        # Simple report aggregations
+        daily_predictions = Prediction.query.filter(Prediction.created_at >= datetime.date.today()).count()
+        total_high_risk = Prediction.query.filter_by(prediction_result='Heart Disease Detected').count() + archive.archived_total('Heart Disease Detected')
+        total_patients = Patient.query.count()
+        
+        # Model Usage (live rows plus archived rollups)
+        usage_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).group_by(Prediction.model_used).all()
+        usage_dict = archive.archived_counts_by_model()
+        for m, n in usage_stats:
+            usage_dict[m] = usage_dict.get(m, 0) + n
+        return {'daily_predictions': daily_predictions, 'total_high_risk': total_high_risk, 'total_patients': total_patients,
+                'models': list(usage_dict), 'usage_counts': list(usage_dict.values())}
     
-    # Model Usage
-    usage_stats = db.session.query(Prediction.model_used, func.count(Prediction.id)).group_by(Prediction.model_used).all()
-    models = [s[0] for s in usage_stats]
-    usage_counts = [s[1] for s in usage_stats]
+    # Shared by every user of the role until predictions or patients change (or the day does)
+    totals = response_cache.fragment('reports.totals', (PREDICTIONS, PATIENTS), aggregate)
     
     # Get high risk patients
     high_risk_predictions = Prediction.query.filter_by(prediction_result='Heart Disease Detected').order_by(Prediction.created_at.desc()).limit(20).all()
     
     return render_template('dashboard/reports.html', 
-                           daily_predictions=daily_predictions, 
-                           total_high_risk=total_high_risk, 
-                           total_patients=total_patients,
+                           daily_predictions=totals['daily_predictions'], 
+                           total_high_risk=totals['total_high_risk'], 
+                           total_patients=totals['total_patients'],
                            high_risk_predictions=high_risk_predictions,
-                           models=models,
-                           usage_counts=usage_counts)
+                           models=totals['models'],
+                           usage_counts=totals['usage_counts'])
 
 @main.route('/delete_patient/<int:patient_id>', methods=['POST'])
 @login_required
@@ -429,11 +538,18 @@ def delete_patient(patient_id):
     
     patient = Patient.query.get_or_404(patient_id)
     # Manually delete related records if cascade not set in DB
+    prediction_ids = db.session.query(Prediction.id).filter_by(patient_id=patient.id)
+    PredictionExplanation.query.filter(PredictionExplanation.prediction_id.in_(prediction_ids)).delete(synchronize_session=False)
     Prediction.query.filter_by(patient_id=patient.id).delete()
     Appointment.query.filter_by(patient_id=patient.id).delete()
+    archived_days = archive.purge_patient(patient.id)
     
     db.session.delete(patient)
     db.session.commit()
+    # Partition files are rewritten only once the rollups and index changes are committed
+    archive.remove_from_partitions(patient.id, archived_days)
+    scheduler.forget()
+    response_cache.bump(PATIENTS, PREDICTIONS, APPOINTMENTS)
     flash('Patient and related records deleted.', 'success')
     return redirect(url_for('main.patients'))
 
@@ -443,8 +559,15 @@ def update_appointment_status(appointment_id):
     appointment = Appointment.query.get_or_404(appointment_id)
     new_status = request.form.get('status')
     if new_status in ['Pending', 'Completed', 'Cancelled']:
-        appointment.status = new_status
-        db.session.commit()
+        try:
+            scheduler.set_status(appointment, new_status)
+        except SlotConflict as e:
+            db.session.rollback()
+            suggestions = ', '.join(slot.strftime('%a %d %b %H:%M') for slot in scheduler.next_free_slots(appointment.doctor_id, appointment.appointment_date, 3))
+            flash(f'Not reinstated: {e}.' + (f' Next free slots: {suggestions}.' if suggestions else ''), 'warning')
+            return redirect(url_for('main.appointments'))
+        response_cache.bump(APPOINTMENTS)
+        events.publish_appointment_status(appointment)
         flash(f'Appointment marked as {new_status}.', 'success')
     return redirect(url_for('main.appointments'))
 
@@ -471,12 +594,14 @@ def toggle_user_status(user_id):
         if new_role in ['Admin', 'Doctor', 'Nurse', 'Receptionist']:
             user.role = new_role
             db.session.commit()
+            response_cache.bump(USERS)
             flash(f'User role updated to {new_role}.', 'success')
             return redirect(url_for('main.users'))
             
     # Handle Status Toggle
     user.is_active = not user.is_active
     db.session.commit()
+    response_cache.bump(USERS)
     status = 'activated' if user.is_active else 'deactivated'
     flash(f'User {user.full_name} {status}.', 'success')
     return redirect(url_for('main.users'))
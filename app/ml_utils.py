@@ -1,9 +1,20 @@
 
 import os
 import pickle
+import threading
+import traceback
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-import traceback
+
+# Form order of the 9 raw inputs (used when model_columns.pkl is missing)
+DEFAULT_FEATURE_NAMES = ['Age', 'Sex', 'Chest pain type', 'Max HR', 'Exercise angina', 'ST depression', 'Slope of ST', 'Number of vessels fluro', 'Thallium']
+
+# Number of (model, inputs) explanations kept in memory
+EXPLANATION_CACHE_SIZE = 512
+
+# Tag stored in compacted forest files (see compaction.py)
+COMPACT_FOREST_FORMAT = 'compact-forest-v1'
 
 class ModelHandler:
     def __init__(self, models_config, scalar_path=None, pca_path=None, columns_path=None):
@@ -12,6 +23,14 @@ class ModelHandler:
         self.scaler = None
         self.pca = None
         self.model_columns = None
+
+        # Optional DriftMonitor fed from preprocess (attached by drift.init_app)
+        self.drift_monitor = None
+
+        # Explanation state: LRU of finished explanations and flattened forests
+        self._explanations = OrderedDict()
+        self._explanations_lock = threading.Lock()
+        self._flat_forests = {}
         
         # Load Main Models
         self.load_models()
@@ -40,6 +59,12 @@ class ModelHandler:
                     self.models[name] = None
                     continue
 
+                # Compacted forests (flask compact-model) are plain numpy arrays, not pickles
+                if path.endswith('.npz'):
+                    self.models[name] = FlatForest.load(path)
+                    print(f"Model '{name}' loaded successfully. Type: {type(self.models[name])}")
+                    continue
+
                 with open(path, 'rb') as f:
                     loaded_obj = pickle.load(f)
                 
@@ -60,9 +85,10 @@ class ModelHandler:
                 print(traceback.format_exc())
                 self.models[name] = None
 
-    def preprocess(self, input_features):
+    def preprocess(self, input_features, track=True):
         """
         Process features: 9 Inputs -> Scaler -> PCA -> 8 Components
+        With track=True the inputs are also fed to the drift monitor.
         """
         # 1. Enforce strict input array of 9 features
         # Input order checked by caller (Form) to be:
@@ -92,36 +118,314 @@ class ModelHandler:
         else:
             print("Warning: PCA not loaded!")
             features_pca = features_scaled
+
+        # 4. Drift statistics (O(1) memory, never touches the database)
+        if track and self.drift_monitor:
+            self.drift_monitor.update(features_array, features_pca if self.pca else None)
             
         return features_pca
 
-    def predict(self, model_name, input_features):
+    def preprocess_batch(self, features):
+        """
+        Vectorized preprocess for an (n, 9) array (offline use: no drift tracking, no debug output).
+        """
+        features_array = np.asarray(features, dtype=float)
+        if features_array.ndim != 2 or features_array.shape[1] != 9:
+            raise ValueError(f"Expected an (n, 9) array, got {features_array.shape}")
+        if self.scaler:
+            features_array = self.scaler.transform(features_array)
+        if self.pca:
+            features_array = self.pca.transform(features_array)
+        return features_array
+
+    def predict_batch(self, model_name, features):
+        """
+        Score many rows at once. Returns (probabilities, predicted labels) as arrays.
+        """
+        model = self.models.get(model_name)
+        if not model:
+            raise ValueError(f"Model '{model_name}' is not loaded")
+        processed = self.preprocess_batch(features)
+        prob = model.predict_proba(processed)[:, 1]
+        pred = model.predict(processed)
+        return prob, np.asarray(pred).astype(int)
+
+    def predict(self, model_name, input_features, track=True):
         model = self.models.get(model_name)
         if not model:
             return "Model Not Loaded", 0.0
 
         try:
             # Preprocess (Scale + PCA)
-            df_processed = self.preprocess(input_features)
-            
-            # Prediction
-            if hasattr(model, 'predict_proba'):
-                prob = model.predict_proba(df_processed)[0][1]
-            else:
-                prob = 0.0
-            
-            pred = model.predict(df_processed)[0]
-            
-            # User requested 'Present' or 'Absent'
-            result_str = "Heart Disease Detected" if pred == 1 else "No Heart Disease"
-            
-            return result_str, prob
+            df_processed = self.preprocess(input_features, track=track)
+            return self._predict_processed(model, df_processed)
             
         except Exception as e:
             print(f"Prediction Error ({model_name}): {e}")
             print(traceback.format_exc())
             return f"Error: {str(e)}", 0.0
-            
+
+    def _predict_processed(self, model, df_processed):
+        # Prediction
+        if hasattr(model, 'predict_proba'):
+            prob = model.predict_proba(df_processed)[0][1]
+        else:
+            prob = 0.0
+        
+        pred = model.predict(df_processed)[0]
+        
+        # User requested 'Present' or 'Absent'
+        result_str = "Heart Disease Detected" if pred == 1 else "No Heart Disease"
+        
+        return result_str, prob
+
+    def predict_with_explanation(self, model_name, input_features, track=True):
+        """
+        Same as predict(), plus the per-feature explanation (or None).
+        The preprocessed features are shared between both steps; pass
+        track=False when the same inputs were already seen by the drift monitor.
+        """
+        model = self.models.get(model_name)
+        if not model:
+            return "Model Not Loaded", 0.0, None
+
+        try:
+            df_processed = self.preprocess(input_features, track=track)
+            result_str, prob = self._predict_processed(model, df_processed)
+        except Exception as e:
+            print(f"Prediction Error ({model_name}): {e}")
+            print(traceback.format_exc())
+            return f"Error: {str(e)}", 0.0, None
+
+        explanation = self.explain(model_name, input_features, df_processed)
+        return result_str, prob, explanation
+
+    # ------------------------------------------------------------------
+    # Explanations
+    # ------------------------------------------------------------------
+
+    def feature_names(self):
+        if self.model_columns is not None and len(self.model_columns) == len(DEFAULT_FEATURE_NAMES):
+            return list(self.model_columns)
+        return list(DEFAULT_FEATURE_NAMES)
+
+    def explain(self, model_name, input_features, df_processed=None):
+        """
+        Which of the 9 raw inputs pushed the score up or down.
+
+        Logistic Regression: exact log-odds contributions, obtained by pushing
+        the coefficients back through the PCA and scaler (they sum to the
+        logit minus the intercept).
+        Random Forest: tree-path contributions in probability units, summed over
+        every tree in one vectorized pass (FlatForest) and split onto the raw
+        inputs by how far each input moved each component (they sum to the
+        probability minus the forest bias).
+
+        Returns a dict (cached per model and inputs) or None if the model
+        cannot be explained.
+        """
+        model = self.models.get(model_name)
+        if not model:
+            return None
+
+        key = (model_name, tuple(float(v) for v in input_features))
+        with self._explanations_lock:
+            if key in self._explanations:
+                self._explanations.move_to_end(key)
+                return self._explanations[key]
+
+        try:
+            features_array = np.array(input_features, dtype=float).reshape(1, -1)
+            if df_processed is None:
+                df_processed = self.preprocess(input_features, track=False)
+
+            if hasattr(model, 'coef_'):
+                base, contributions, units = self._explain_linear(model, features_array)
+            elif hasattr(model, 'contributions') or hasattr(model, 'estimators_'):
+                base, contributions, units = self._explain_forest(model, features_array, df_processed)
+            else:
+                return None
+        except Exception as e:
+            print(f"Explanation Error ({model_name}): {e}")
+            print(traceback.format_exc())
+            return None
+
+        explanation = {
+            'model': model_name,
+            'units': units,
+            'base': float(base),
+            'contributions': sorted(
+                [{'feature': name, 'value': float(value), 'contribution': float(c)}
+                 for name, value, c in zip(self.feature_names(), features_array[0], contributions)],
+                key=lambda item: abs(item['contribution']), reverse=True)
+        }
+
+        with self._explanations_lock:
+            self._explanations[key] = explanation
+            if len(self._explanations) > EXPLANATION_CACHE_SIZE:
+                self._explanations.popitem(last=False)
+        return explanation
+
+    def _centered_inputs(self, features_array):
+        """Scaled inputs minus the PCA mean, i.e. what the PCA projects."""
+        # Plain numpy: scaler.transform would repeat sklearn's input validation for a row preprocess() already scaled
+        z = features_array[0]
+        if self.scaler:
+            if getattr(self.scaler, 'mean_', None) is not None:
+                z = z - self.scaler.mean_
+            if getattr(self.scaler, 'scale_', None) is not None:
+                z = z / self.scaler.scale_
+        if self.pca:
+            z = z - self.pca.mean_
+        return z
+
+    def _pca_loadings(self):
+        """(n_components, n_features) map from centered inputs to model inputs."""
+        components = self.pca.components_
+        if self.pca.whiten:
+            components = components / np.sqrt(self.pca.explained_variance_)[:, None]
+        return components
+
+    def _explain_linear(self, model, features_array):
+        coef = model.coef_[0]
+        z = self._centered_inputs(features_array)
+        weights = coef @ self._pca_loadings() if self.pca else coef
+        return model.intercept_[0], weights * z, 'log-odds'
+
+    def _explain_forest(self, model, features_array, df_processed):
+        forest = model if hasattr(model, 'contributions') else self._flat_forest(model)
+        bias, component_contribs = forest.contributions(df_processed)
+        component_contribs = component_contribs[0]
+
+        if not self.pca:
+            return bias, component_contribs, 'probability'
+
+        # Split each component's contribution across the raw inputs in proportion
+        # to how much each input moved that component's score. Magnitudes keep the
+        # split bounded when opposing inputs cancel inside a component.
+        shares = np.abs(self._pca_loadings() * self._centered_inputs(features_array))
+        totals = shares.sum(axis=1, keepdims=True)
+        loadings = np.abs(self.pca.components_)
+        fallback = loadings / loadings.sum(axis=1, keepdims=True)
+        degenerate = np.abs(totals) < 1e-12
+        shares = np.where(degenerate, fallback, shares / np.where(degenerate, 1.0, totals))
+        return bias, component_contribs @ shares, 'probability'
+
+    def _flat_forest(self, model):
+        """FlatForest view of a fitted sklearn forest, built once per model."""
+        cached = self._flat_forests.get(id(model))
+        if cached is None or cached[0] is not model:
+            cached = (model, FlatForest.from_sklearn(model))
+            self._flat_forests[id(model)] = cached
+        return cached[1]
+
+
+class FlatForest:
+    """
+    Every tree of a forest laid out in shared flat arrays, so all trees are
+    walked together with a few numpy operations per depth level instead of
+    one Python-level call per tree. Leaves point back to themselves, which
+    lets a fixed max_depth number of steps land every sample on its leaf.
+    """
+    def __init__(self, feature, threshold, left, right, roots, prob, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.roots = roots
+        self.prob = prob  # P(class 1) at every node
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = np.array([0, 1])
+        self._node_contributions = None
+        # left/right interleaved, so one gather moves every sample down a level
+        self._children = np.stack([left, right], axis=1).ravel()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, rights, roots, probs = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            value = tree.value[:, 0, :]
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            probs.append(value[:, 1] / value.sum(axis=1))
+            roots.append(offset)
+            offset += tree.node_count
+        max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+                   np.concatenate(rights), np.array(roots), np.concatenate(probs), max_depth, model.n_features_in_)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.prob)
+
+    def save(self, path):
+        np.savez_compressed(path, format=COMPACT_FOREST_FORMAT, feature=self.feature, threshold=self.threshold,
+                            left=self.left, right=self.right, roots=self.roots, prob=self.prob,
+                            max_depth=self.max_depth, n_features=self.n_features_in_)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['format']) != COMPACT_FOREST_FORMAT:
+                raise ValueError(f"Unsupported forest format: {data['format']}")
+            return cls(data['feature'], data['threshold'], data['left'], data['right'], data['roots'],
+                       data['prob'], data['max_depth'], data['n_features'])
+
+    def leaves(self, X):
+        """(n_samples, n_trees) leaf node ids."""
+        # Trees compare float32 inputs, exactly like sklearn does
+        X = np.asarray(X, dtype=np.float32)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(X.shape[0]) * X.shape[1])[:, None]
+        node = np.tile(self.roots, (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            go_right = ~(np.take(flat_X, row_offsets + np.take(self.feature, node)) <= np.take(self.threshold, node))
+            node = np.take(self._children, node * 2 + go_right)
+        return node
+
+    def predict_proba(self, X):
+        p = self.prob[self.leaves(X)].mean(axis=1)
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def node_contributions(self):
+        """
+        (n_nodes, n_features) tree-path contributions accumulated from the root
+        to each node: every step adds the change in P(class 1) to the feature
+        the parent split on. Computed level by level across the whole forest.
+        """
+        if self._node_contributions is None:
+            contrib = np.zeros((len(self.prob), self.n_features_in_))
+            frontier = self.roots
+            while len(frontier):
+                internal = frontier[self.left[frontier] != frontier]
+                children = []
+                for child in (self.left[internal], self.right[internal]):
+                    contrib[child] = contrib[internal]
+                    contrib[child, self.feature[internal]] += self.prob[child] - self.prob[internal]
+                    children.append(child)
+                frontier = np.concatenate(children)
+            self._node_contributions = contrib
+        return self._node_contributions
+
+    def contributions(self, X):
+        """(bias, (n_samples, n_features)) mean path contributions over the forest."""
+        leaves = self.leaves(X)
+        bias = self.prob[self.roots].mean()
+        return bias, self.node_contributions()[leaves].mean(axis=1)
 
 
 # Initialize handler
@@ -130,7 +434,8 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
 LR_PATH = os.path.join(PROJECT_ROOT, "heart_modelrg.pkl")
-RF_PATH = os.path.join(PROJECT_ROOT, "heart_model.pkl")
+# RF_MODEL_PATH can point at a compacted forest (.npz) produced by `flask compact-model`
+RF_PATH = os.environ.get('RF_MODEL_PATH') or os.path.join(PROJECT_ROOT, "heart_model.pkl")
 
 SCALER_PATH = os.path.join(PROJECT_ROOT, "scaler.pkl")
 PCA_PATH = os.path.join(PROJECT_ROOT, "pca.pkl")
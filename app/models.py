@@ -28,19 +28,54 @@ class Patient(db.Model):
 
 class Prediction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
     prediction_result = db.Column(db.String(50))  # "Heart Disease Detected" / "No Heart Disease"
     probability_score = db.Column(db.Float)
     model_used = db.Column(db.String(50))  # "Logistic Regression", "Random Forest"
     input_data = db.Column(db.Text)  # JSON string of input features
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class PredictionExplanation(db.Model):
+    # Per-feature contributions computed with the prediction (JSON from ModelHandler.explain)
+    id = db.Column(db.Integer, primary_key=True)
+    prediction_id = db.Column(db.Integer, db.ForeignKey('prediction.id'), nullable=False, unique=True)
+    payload = db.Column(db.Text, nullable=False)
+    prediction = db.relationship('Prediction', backref=db.backref('explanation', uselist=False))
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+class PredictionRollup(db.Model):
+    # Daily counts for predictions that have been moved to the Parquet archive
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    model_used = db.Column(db.String(50))
+    prediction_result = db.Column(db.String(50))
+    count = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (db.UniqueConstraint('day', 'model_used', 'prediction_result'),)
+
+class ArchivedPatientDay(db.Model):
+    # Archive partitions (days) holding a patient's predictions, so per-patient reads and purges skip the rest
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    __table_args__ = (db.UniqueConstraint('patient_id', 'day'),)
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Assigned doctor
     doctor = db.relationship('User', backref='appointments')
-    appointment_date = db.Column(db.DateTime, nullable=False)
+    appointment_date = db.Column(db.DateTime, nullable=False, index=True)
     status = db.Column(db.String(20), default='Pending')  # Pending, Completed, Cancelled
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-doctor schedule lookups and conflict checks, plus one active appointment per doctor and
+    # start time enforced by the database, so workers booking concurrently cannot both succeed
+    # ('Cancelled' mirrors scheduling.INACTIVE_STATUSES)
+    __table_args__ = (
+        db.Index('ix_appointment_doctor_date', 'doctor_id', 'appointment_date'),
+        db.Index('uq_appointment_doctor_active_start', 'doctor_id', 'appointment_date', unique=True,
+                 sqlite_where=db.text("status != 'Cancelled'"), postgresql_where=db.text("status != 'Cancelled'")),
+    )
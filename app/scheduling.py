@@ -0,0 +1,253 @@
+import math
+import time
+import bisect
+import datetime
+import threading
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from . import db
+from .models import Appointment
+
+# Appointments in these states no longer hold their slot
+INACTIVE_STATUSES = ('Cancelled',)
+
+# Seconds before a doctor's in-memory schedule is re-read (other workers may have booked since)
+SCHEDULE_TTL = 60
+
+# How far ahead the free-slot search looks
+SEARCH_HORIZON_DAYS = 60
+
+
+class SlotConflict(ValueError):
+    def __init__(self, start, appointment_id):
+        self.start = start
+        self.appointment_id = appointment_id
+        super().__init__(f"the doctor already has an appointment at {start.strftime('%Y-%m-%d %H:%M')}")
+
+
+class DoctorSchedule:
+    """
+    Start times of one doctor's upcoming active appointments, kept sorted so
+    an overlap check is a single bisect. Every appointment occupies
+    one slot, so a new slot at t clashes only with the first start after t - slot.
+    """
+    def __init__(self, rows):
+        self.starts = [start for start, _ in rows]
+        self.ids = [appointment_id for _, appointment_id in rows]
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def conflict(self, start, slot):
+        """(start, id) of the appointment overlapping [start, start + slot), or None."""
+        i = bisect.bisect_right(self.starts, start - slot)
+        if i < len(self.starts) and self.starts[i] < start + slot:
+            return self.starts[i], self.ids[i]
+        return None
+
+    def add(self, start, appointment_id):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ids.insert(i, appointment_id)
+
+    def remove(self, start, appointment_id):
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == appointment_id:
+                del self.starts[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def free_slots(self, after, n, slot, hours, horizon):
+        """First `n` open slots from `after`, walking the sorted starts once."""
+        found = []
+        t = after
+        i = bisect.bisect_right(self.starts, t - slot)
+        while len(found) < n:
+            t = hours.next_open(t, slot)
+            if t is None or t > horizon:
+                break
+            while i < len(self.starts) and self.starts[i] <= t - slot:
+                i += 1
+            if i < len(self.starts) and self.starts[i] < t + slot:
+                # Booked: continue right after the blocking appointment
+                t = self.starts[i] + slot
+                continue
+            found.append(t)
+            t += slot
+        return found
+
+
+class ClinicHours:
+    def __init__(self, open_hour, close_hour, working_days):
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.working_days = set(working_days)
+
+    def next_open(self, t, slot):
+        """Earliest slot-aligned time >= t that fits inside opening hours, or None if the clinic never opens."""
+        if not self.working_days or self.close_hour <= self.open_hour:
+            return None
+        midnight = datetime.datetime.combine(t.date(), datetime.time())
+        step = slot.total_seconds()
+        t = midnight + datetime.timedelta(seconds=math.ceil((t - midnight).total_seconds() / step) * step)
+        while True:
+            day = datetime.datetime.combine(t.date(), datetime.time())
+            opens = day + datetime.timedelta(hours=self.open_hour)
+            closes = day + datetime.timedelta(hours=self.close_hour)
+            t = max(t, opens)
+            if t.weekday() in self.working_days and t + slot <= closes:
+                return t
+            t = day + datetime.timedelta(days=1)
+
+
+class Scheduler:
+    """
+    Per-doctor interval index over Appointment. Schedules are loaded lazily
+    from the (doctor_id, appointment_date) index and refreshed after
+    SCHEDULE_TTL seconds; they hold only appointments that can still clash
+    with a new booking (from one slot before load time), so memory does not
+    grow with history. Bookings are re-checked against the database before
+    they are committed, so a slot taken by another worker, or a backdated
+    one, is still rejected. The per-doctor locks only cover one process; a
+    partial unique index on active (doctor_id, appointment_date) rows stops
+    two workers committing the same start, and _commit() reports that as a
+    SlotConflict.
+    """
+    def __init__(self, slot_minutes=30, open_hour=8, close_hour=17, working_days=(0, 1, 2, 3, 4), ttl=SCHEDULE_TTL):
+        self.configure(slot_minutes, open_hour, close_hour, working_days)
+        self.ttl = ttl
+        self._schedules = {}
+        self._lock = threading.Lock()
+        self._doctor_locks = {}
+
+    def configure(self, slot_minutes, open_hour, close_hour, working_days):
+        self.slot = datetime.timedelta(minutes=slot_minutes)
+        self.hours = ClinicHours(open_hour, close_hour, working_days)
+
+    def _doctor_lock(self, doctor_id):
+        with self._lock:
+            return self._doctor_locks.setdefault(doctor_id, threading.Lock())
+
+    def schedule(self, doctor_id):
+        cached = self._schedules.get(doctor_id)
+        if cached is not None and time.monotonic() - cached.loaded_at < self.ttl:
+            return cached
+        since = datetime.datetime.now() - self.slot
+        rows = db.session.query(Appointment.appointment_date, Appointment.id) \
+            .filter(Appointment.doctor_id == doctor_id, Appointment.appointment_date >= since,
+                    Appointment.status.notin_(INACTIVE_STATUSES)) \
+            .order_by(Appointment.appointment_date, Appointment.id).all()
+        schedule = DoctorSchedule(rows)
+        self._schedules[doctor_id] = schedule
+        return schedule
+
+    def forget(self, doctor_id=None):
+        """Drop cached schedules (all of them by default) after bulk changes."""
+        if doctor_id is None:
+            self._schedules.clear()
+        else:
+            self._schedules.pop(doctor_id, None)
+
+    def _db_conflict(self, doctor_id, start):
+        return db.session.query(Appointment.appointment_date, Appointment.id).filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date > start - self.slot,
+            Appointment.appointment_date < start + self.slot,
+            Appointment.status.notin_(INACTIVE_STATUSES)
+        ).order_by(Appointment.appointment_date).first()
+
+    def _commit(self, doctor_id, start):
+        """Commit the session; a unique-index violation on the doctor's slot becomes SlotConflict."""
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            clash = self._db_conflict(doctor_id, start)
+            if clash is None:
+                raise
+            # Committed by another worker after our check
+            self.forget(doctor_id)
+            raise SlotConflict(*clash)
+
+    def find_conflict(self, doctor_id, start):
+        """(start, id) of an active appointment overlapping a slot at `start`, or None."""
+        if doctor_id is None:
+            return None
+        clash = self.schedule(doctor_id).conflict(start, self.slot)
+        if clash is not None:
+            return clash
+        clash = self._db_conflict(doctor_id, start)
+        if clash is not None:
+            # Booked by another worker since this schedule was loaded
+            self.forget(doctor_id)
+        return clash
+
+    def book(self, patient_id, doctor_id, start, notes=None):
+        """Create and commit a Pending appointment; raises SlotConflict if the doctor is busy."""
+        doctor_id = int(doctor_id) if doctor_id else None
+        with self._doctor_lock(doctor_id):
+            clash = self.find_conflict(doctor_id, start)
+            if clash is not None:
+                raise SlotConflict(*clash)
+            appointment = Appointment(patient_id=patient_id, doctor_id=doctor_id, appointment_date=start,
+                                      notes=notes, status='Pending')
+            db.session.add(appointment)
+            self._commit(doctor_id, start)
+            if doctor_id is not None and doctor_id in self._schedules:
+                self._schedules[doctor_id].add(start, appointment.id)
+        return appointment
+
+    def set_status(self, appointment, status):
+        """
+        Commit a status change. Reinstating a cancelled appointment re-checks
+        its slot under the doctor's lock (it may have been booked since) and
+        raises SlotConflict if it is taken.
+        """
+        old_status = appointment.status
+        with self._doctor_lock(appointment.doctor_id):
+            if old_status in INACTIVE_STATUSES and status not in INACTIVE_STATUSES:
+                clash = self.find_conflict(appointment.doctor_id, appointment.appointment_date)
+                if clash is not None:
+                    raise SlotConflict(*clash)
+            appointment.status = status
+            self._commit(appointment.doctor_id, appointment.appointment_date)
+            self.status_changed(appointment, old_status)
+        return appointment
+
+    def status_changed(self, appointment, old_status):
+        """Keep the index in step when an appointment is cancelled or reinstated."""
+        schedule = self._schedules.get(appointment.doctor_id)
+        if schedule is None:
+            return
+        was_active = old_status not in INACTIVE_STATUSES
+        is_active = appointment.status not in INACTIVE_STATUSES
+        if was_active and not is_active:
+            schedule.remove(appointment.appointment_date, appointment.id)
+        elif is_active and not was_active:
+            schedule.add(appointment.appointment_date, appointment.id)
+
+    def next_free_slots(self, doctor_id, after=None, n=5):
+        # Never offer past slots (the schedule does not hold them either)
+        after = max(after or datetime.datetime.now(), datetime.datetime.now())
+        horizon = after + datetime.timedelta(days=SEARCH_HORIZON_DAYS)
+        return self.schedule(doctor_id).free_slots(after, n, self.slot, self.hours, horizon)
+
+
+def appointments_between(start, end, doctor_id=None):
+    """Appointments in [start, end) with patient and doctor loaded in the same query."""
+    query = Appointment.query.options(joinedload(Appointment.patient), joinedload(Appointment.doctor)) \
+        .filter(Appointment.appointment_date >= start, Appointment.appointment_date < end)
+    if doctor_id:
+        query = query.filter(Appointment.doctor_id == doctor_id)
+    return query.order_by(Appointment.appointment_date).all()
+
+
+scheduler = Scheduler()
+
+
+def init_app(app):
+    scheduler.configure(app.config['APPOINTMENT_SLOT_MINUTES'], app.config['CLINIC_OPEN_HOUR'],
+                        app.config['CLINIC_CLOSE_HOUR'], app.config['CLINIC_WORKING_DAYS'])
@@ -0,0 +1,87 @@
+"""
+Explanation overhead benchmark.
+
+Times ModelHandler.predict() against predict_with_explanation() on fresh
+(uncached) inputs for both models and fails if the explanation adds more
+than MAX_OVERHEAD of the plain inference time. Each timing is the best of
+--repeat passes, so a noisy pass does not decide the result.
+
+    python benchmarks/bench_explanations.py [--samples 300] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from synthetic_data import random_features  # noqa: E402
+
+# Explanation time may add at most this fraction of plain inference time
+MAX_OVERHEAD = 0.5
+
+
+def random_inputs(n, seed=0):
+    # Same encoding as the prediction form and the load test
+    return random_features(np.random.default_rng(seed), n).tolist()
+
+
+def timed(fn, rows, before=None):
+    # preprocess() prints debug lines; keep them out of the timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        if before:
+            before()
+        start = time.perf_counter()
+        for row in rows:
+            fn(row)
+        return (time.perf_counter() - start) / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5, help='Passes per measurement; the best one is reported.')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app.ml_utils import model_handler
+
+    failed = False
+    for model_name in ('Logistic Regression', 'Random Forest'):
+        if model_handler.models.get(model_name) is None:
+            print(f"{model_name}: not loaded, skipped")
+            continue
+
+        # Warm up (builds the forest path matrix once)
+        warm = random_inputs(5, seed=1)
+        timed(lambda row: model_handler.predict_with_explanation(model_name, row), warm)
+
+        rows = random_inputs(args.samples, seed=2)
+        clear = model_handler._explanations.clear
+        plain, explained, cached = [], [], []
+        # Interleave the passes so drift in machine load hits every measurement alike
+        for _ in range(args.repeat):
+            plain.append(timed(lambda row: model_handler.predict(model_name, row), rows))
+            explained.append(timed(lambda row: model_handler.predict_with_explanation(model_name, row), rows, before=clear))
+            cached.append(timed(lambda row: model_handler.predict_with_explanation(model_name, row), rows))
+        plain, explained, cached = min(plain), min(explained), min(cached)
+
+        overhead = (explained - plain) / plain
+        ok = overhead <= MAX_OVERHEAD
+        failed |= not ok
+        print(f"{model_name:20s} predict {plain * 1e3:7.3f} ms | +explain {explained * 1e3:7.3f} ms "
+              f"({overhead:+.0%}) | cached {cached * 1e3:7.3f} ms | {'OK' if ok else 'FAIL'}")
+
+    print(f"Limit: explanation overhead <= {MAX_OVERHEAD:.0%} of inference time (best of {args.repeat} passes)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
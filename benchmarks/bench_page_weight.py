@@ -0,0 +1,123 @@
+"""
+Page-weight benchmark for the static asset pipeline.
+
+Loads the login page and the dashboard through the Flask test client, follows
+every local stylesheet, image and CSS url() the way a modern browser would
+(first <picture> source / image-set() option that exists, br/gzip accepted),
+and reports bytes transferred with the original static files ("before") and
+with the hashed build from `flask build-assets` ("after"). Repeat views count
+what a browser still has to request once the first view is cached.
+
+    flask --app run build-assets
+    python benchmarks/bench_page_weight.py
+"""
+import os
+import re
+import sys
+import tempfile
+import warnings
+import contextlib
+import io
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+TAG_URLS = re.compile(r"""<(?:link|img|source)\b[^>]*?(?:href|src|srcset)="(/static/[^"]+)\"""")
+PICTURE = re.compile(r"<picture>(.*?)</picture>", re.S)
+CSS_IMAGE_SET = re.compile(r"""background-image:\s*url\([^)]*\);\s*background-image:\s*image-set\(\s*url\(["']?([^"')]+)["']?\)[^;]*\);""")
+CSS_URL = re.compile(r"""url\(["']?([^"')]+)["']?\)""")
+
+
+def page_assets(html):
+    """Static URLs a browser fetches for a page: one candidate per <picture>, then everything else."""
+    urls = []
+    for block in PICTURE.findall(html):
+        candidates = TAG_URLS.findall(block)
+        if candidates:
+            urls.append(candidates[0])
+    urls += TAG_URLS.findall(PICTURE.sub('', html))
+    return list(dict.fromkeys(urls))
+
+
+def css_assets(css_url, text):
+    # image-set(): the browser takes the first option; the plain url() before it is only a fallback
+    chosen = CSS_IMAGE_SET.findall(text)
+    rest = CSS_URL.findall(CSS_IMAGE_SET.sub('', text))
+    return [urljoin(css_url, u) for u in chosen + rest if not u.startswith(('data:', 'http', '//'))]
+
+
+def measure(client, path, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = client.get(path, headers=headers)
+    html = response.get_data(as_text=True)
+    rows = [(path, len(response.data), 'page', None)]
+
+    queue = page_assets(html)
+    seen = set()
+    while queue:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        response = client.get(url, headers=headers)
+        body = response.data
+        rows.append((url, len(body), response.status_code, response.headers.get('Cache-Control')))
+        if response.status_code == 200 and url.split('?')[0].endswith('.css'):
+            text = body
+            encoding = response.headers.get('Content-Encoding')
+            if encoding == 'br':
+                import brotli
+                text = brotli.decompress(body)
+            elif encoding == 'gzip':
+                import gzip
+                text = gzip.decompress(body)
+            queue += css_assets(url, text.decode('utf-8'))
+        response.close()
+    return rows
+
+
+def report(label, rows):
+    total = sum(size for _, size, _, _ in rows)
+    repeat_requests = sum(1 for _, _, status, cache in rows[1:] if status == 200 and 'immutable' not in (cache or ''))
+    print(f"\n{label}")
+    for url, size, status, cache in rows:
+        note = '' if status in ('page', 200) else f' [{status}]'
+        print(f"  {size / 1024:10.1f}KB  {url}{note}")
+    print(f"  {total / 1024:10.1f}KB  total, {repeat_requests} asset request(s) again on repeat view")
+    return total
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault('DRIFT_SNAPSHOT_DIR', os.path.join(tmp, 'drift'))
+    # Both passes render /dashboard; a cached page would hide the asset URLs of the second one
+    os.environ['CACHE_BACKEND'] = 'none'
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+        app = create_app()
+    if not app.extensions.get('asset_manifest'):
+        print("No asset manifest found; run `flask --app run build-assets` first.")
+        sys.exit(1)
+
+    client = app.test_client()
+    client.post('/register', data={'email': 'bench@example.com', 'name': 'Bench', 'phone': '0',
+                                   'password': 'bench', 'confirm_password': 'bench', 'role': 'Admin'})
+
+    totals = {}
+    for label, use_manifest, accept in (('before', False, None), ('after', True, 'br, gzip')):
+        app.config['ASSETS_USE_MANIFEST'] = use_manifest
+        client.get('/logout')
+        totals[(label, 'login')] = report(f"{label}: /login", measure(client, '/login', accept))
+        client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+        totals[(label, 'dashboard')] = report(f"{label}: /dashboard", measure(client, '/dashboard', accept))
+
+    print()
+    for page in ('login', 'dashboard'):
+        before, after = totals[('before', page)], totals[('after', page)]
+        print(f"{page:10s} {before / 1024:10.1f}KB -> {after / 1024:8.1f}KB ({1 - after / before:.1%} smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Response cache benchmark for the dashboard, reports and model comparison pages.
+
+Generates synthetic data (benchmarks/synthetic_data.py), then times each page
+with the cache disabled, as a cache hit and as a 304 revalidation
+(If-None-Match), for the in-process and the SQLite backend. Also times the
+first request after a write has bumped the version counters, and the first
+view by another user of the same role, which renders the page around the
+shared aggregates.
+
+    python benchmarks/bench_response_cache.py
+    python benchmarks/bench_response_cache.py --scale large --repeat 20
+"""
+import os
+import sys
+import io
+import time
+import argparse
+import tempfile
+import warnings
+import contextlib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from synthetic_data import SCALES, LOADTEST_PASSWORD, create_seeded_app, user_email  # noqa: E402
+
+PAGES = ['/dashboard', '/reports', '/compare_models']
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='medium')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault('DRIFT_SNAPSHOT_DIR', os.path.join(tmp, 'drift'))
+    app = create_seeded_app(os.path.join(tmp, 'bench.db'), args.scale)
+    from app import cache
+    from app.cache import response_cache, PREDICTIONS
+
+    client = app.test_client()
+    client.post('/login', data={'email': user_email(1), 'password': LOADTEST_PASSWORD})
+
+    from app.models import User
+    with app.app_context():
+        role = User.query.filter_by(email=user_email(1)).one().role
+        peers = [row[0] for row in User.query.with_entities(User.email).filter(User.role == role, User.email != user_email(1))]
+
+    def first_views(page):
+        """Median first request to `page` by other users of the same role (each logged in beforehand)."""
+        clients = []
+        for email in peers[:args.repeat]:
+            other = app.test_client()
+            other.post('/login', data={'email': email, 'password': LOADTEST_PASSWORD})
+            clients.append(other)
+        times = []
+        for other in clients:
+            start = time.perf_counter()
+            other.get(page).get_data()
+            times.append(time.perf_counter() - start)
+        return float(np.median(times) * 1000) if times else None
+
+    rows = []
+    for backend in ('none', 'memory', 'sqlite'):
+        app.config['CACHE_BACKEND'] = backend
+        app.config['CACHE_SQLITE_PATH'] = os.path.join(tmp, f'cache-{backend}.sqlite')
+        cache.init_app(app)
+        for page in PAGES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = client.get(page)
+                etag = response.headers.get('ETag')
+                served = median_ms(lambda: client.get(page).get_data(), args.repeat)
+                revalidated = median_ms(lambda: client.get(page, headers={'If-None-Match': etag}), args.repeat) if etag else None
+                status = client.get(page, headers={'If-None-Match': etag}).status_code if etag else None
+
+                def after_write():
+                    response_cache.bump(PREDICTIONS)
+                    client.get(page).get_data()
+                invalidated = median_ms(after_write, args.repeat) if backend != 'none' else None
+                client.get(page).get_data()
+                other_user = first_views(page) if backend != 'none' else None
+            rows.append((backend, page, served, revalidated, status, invalidated, other_user))
+
+    def cell(ms):
+        return f"{ms:9.2f}ms" if ms is not None else f"{'-':>11s}"
+
+    print(f"\nMedian of {args.repeat} requests ({args.scale} data)")
+    print(f"{'backend':8s} {'page':16s} {'200 response':>12s} {'revalidate':>11s} {'status':>7s} {'after write':>12s} "
+          f"{'other user':>12s}")
+    for backend, page, served, revalidated, status, invalidated, other_user in rows:
+        print(f"{backend:8s} {page:16s} {cell(served)} {'(uncached)' if backend == 'none' else '     (hit)'}"
+              f" {cell(revalidated)} {status or '-':>7} {cell(invalidated)}  {cell(other_user)}")
+
+
+if __name__ == '__main__':
+    main()
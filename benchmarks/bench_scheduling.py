@@ -0,0 +1,162 @@
+"""
+Scheduling benchmark with 100k appointments.
+
+Fills a temporary SQLite database with non-overlapping appointments for a set
+of doctors, then times:
+  * conflict checks: scanning all of a doctor's appointments (what booking
+    would need without an index), the database range query with and without
+    the (doctor_id, appointment_date) index, and the in-memory bisect;
+  * the "next N free slots" search;
+  * the appointments page query: every row with lazy-loaded patient/doctor
+    (the old listing) against a two-week, eager-loaded range.
+
+    python benchmarks/bench_scheduling.py
+    python benchmarks/bench_scheduling.py --appointments 100000 --doctors 50
+"""
+import os
+import sys
+import io
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import warnings
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def seed(db, User, Patient, Appointment, n_appointments, n_doctors, n_patients, slot, hours, rng):
+    db.session.execute(User.__table__.insert(), [
+        {'full_name': f'Doctor {i}', 'email': f'doctor{i}@example.com', 'role': 'Doctor', 'is_active': True}
+        for i in range(n_doctors)])
+    db.session.execute(Patient.__table__.insert(), [
+        {'full_name': f'Patient {i}', 'gender': rng.choice(['Male', 'Female'])} for i in range(n_patients)])
+    doctor_ids = [row[0] for row in db.session.query(User.id)]
+    patient_ids = [row[0] for row in db.session.query(Patient.id)]
+
+    # Every working slot over roughly two years around today; each doctor books a random subset
+    grid = []
+    t = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=365), datetime.time())
+    end = t + datetime.timedelta(days=730)
+    while True:
+        t = hours.next_open(t, slot)
+        if t >= end:
+            break
+        grid.append(t)
+        t += slot
+
+    per_doctor = n_appointments // len(doctor_ids)
+    rows = []
+    for doctor_id in doctor_ids:
+        for start in rng.sample(grid, min(per_doctor, len(grid))):
+            rows.append({'patient_id': rng.choice(patient_ids), 'doctor_id': doctor_id, 'appointment_date': start,
+                         'status': rng.choice(['Pending', 'Completed', 'Completed', 'Cancelled'])})
+    for i in range(0, len(rows), 10000):
+        db.session.execute(Appointment.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+    return doctor_ids, grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--checks', type=int, default=500, help='Conflict checks per method.')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault('DRIFT_SNAPSHOT_DIR', os.path.join(tmp, 'drift'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app, db
+        from app.models import User, Patient, Appointment
+        from app.scheduling import scheduler, appointments_between, INACTIVE_STATUSES
+        app = create_app()
+
+    rng = random.Random(0)
+    with app.app_context():
+        start = time.perf_counter()
+        doctor_ids, grid = seed(db, User, Patient, Appointment, args.appointments, args.doctors, args.patients,
+                                scheduler.slot, scheduler.hours, rng)
+        total = Appointment.query.count()
+        print(f"Seeded {total} appointments for {len(doctor_ids)} doctors in {time.perf_counter() - start:.1f}s")
+
+        # Bookings are for upcoming slots; the in-memory schedules only hold those
+        upcoming = [t for t in grid if t > datetime.datetime.now()]
+        probes = [(rng.choice(doctor_ids), rng.choice(upcoming) + datetime.timedelta(minutes=rng.choice([0, 10, 20])))
+                  for _ in range(args.checks)]
+        slot = scheduler.slot
+
+        def scan_all():
+            for doctor_id, t in probes[:50]:
+                rows = db.session.query(Appointment.appointment_date) \
+                    .filter(Appointment.doctor_id == doctor_id, Appointment.status.notin_(INACTIVE_STATUSES)).all()
+                any(abs(row[0] - t) < slot for row in rows)
+
+        def db_range():
+            for doctor_id, t in probes:
+                scheduler._db_conflict(doctor_id, t)
+
+        def in_memory():
+            for doctor_id, t in probes:
+                scheduler.schedule(doctor_id).conflict(t, slot)
+
+        # Warm the per-doctor schedules once; load cost is reported separately
+        load_ms = timed(lambda: [scheduler.forget(d) or scheduler.schedule(d) for d in doctor_ids], 1) / len(doctor_ids)
+        conflicts = [scheduler.schedule(d).conflict(t, slot) is not None for d, t in probes]
+        disagree = sum(c != (scheduler._db_conflict(d, t) is not None) for c, (d, t) in zip(conflicts, probes))
+
+        indexes = list(Appointment.__table__.indexes)
+        results = [('scan doctor appointments', timed(scan_all, 1) / 50)]
+        for index in indexes:
+            index.drop(db.engine)
+        results.append(('DB range, no index', timed(db_range, 1) / len(probes)))
+        for index in indexes:
+            index.create(db.engine)
+        results.append(('DB range, indexed', timed(db_range, 1) / len(probes)))
+        results.append(('in-memory bisect', timed(in_memory, 3) / len(probes)))
+
+        print(f"\nConflict check ({len(probes)} probes, {sum(conflicts)} conflicting, "
+              f"{disagree} disagreement(s) between index and database)")
+        for label, ms in results:
+            print(f"  {label:28s} {ms * 1000:10.1f}us")
+        print(f"  per-doctor schedule load   {load_ms * 1000:10.1f}us (once per doctor per {scheduler.ttl}s)")
+
+        now = datetime.datetime.now()
+        free_ms = timed(lambda: [scheduler.next_free_slots(d, now, 10) for d in doctor_ids], 3) / len(doctor_ids)
+        print(f"\nNext 10 free slots: {free_ms * 1000:.1f}us per doctor")
+
+        def old_listing():
+            for a in Appointment.query.all():
+                a.patient.full_name, a.doctor.full_name if a.doctor else None
+            db.session.expunge_all()
+
+        today = datetime.date.today()
+
+        def range_listing():
+            for a in appointments_between(today, today + datetime.timedelta(days=15)):
+                a.patient.full_name, a.doctor.full_name if a.doctor else None
+            db.session.expunge_all()
+
+        shown = len(appointments_between(today, today + datetime.timedelta(days=15)))
+        db.session.expunge_all()
+        old_ms = timed(old_listing, 1)
+        new_ms = timed(range_listing, 3)
+        print("\nAppointments page query")
+        print(f"  all rows, lazy relationships {old_ms:9.1f}ms ({total} rows)")
+        print(f"  two weeks, eager loaded      {new_ms:9.1f}ms ({shown} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Fan-out benchmark for the live dashboard stream (/events).
+
+Starts the app on a threaded local server (one thread per connection, like a
+gunicorn gthread worker), opens N logged-in EventSource-style connections,
+publishes a burst of events through the in-process broker and measures how
+long each viewer takes to receive them. A viewer count is "sustained" when
+every event reaches every viewer and the p99 delivery latency stays under
+the budget. The stream limit is raised to the largest viewer count for the
+run, then checked: one connection past it must get a 503.
+
+    python benchmarks/bench_sse_fanout.py
+    python benchmarks/bench_sse_fanout.py --viewers 100 500 1000 2000 --events 20
+"""
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import tempfile
+import threading
+import warnings
+import contextlib
+import http.client
+import urllib.parse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+LATENCY_BUDGET_MS = 1000
+
+
+def login_cookie(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    body = urllib.parse.urlencode({'email': 'bench@example.com', 'password': 'bench'})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    cookie = response.getheader('Set-Cookie').split(';')[0]
+    conn.close()
+    return cookie
+
+
+def viewer(port, cookie, expected, latencies, connected, errors):
+    """Read the stream until `expected` bench events arrived, recording receive latency for each."""
+    received = []
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        conn.request('GET', '/events', headers={'Cookie': cookie, 'Accept': 'text/event-stream'})
+        response = conn.getresponse()
+        connected.release()
+        while len(received) < expected:
+            line = response.readline()
+            if not line:
+                break
+            if line.startswith(b'data: '):
+                sent = json.loads(line[6:])['sent']
+                received.append(time.perf_counter() - sent)
+        conn.close()
+    except Exception as e:
+        errors.append(repr(e))
+        connected.release()
+    latencies.append(received)
+
+
+def run(broker, port, cookie, n_viewers, n_events, interval):
+    latencies, errors = [], []
+    connected = threading.Semaphore(0)
+    threads = [threading.Thread(target=viewer, args=(port, cookie, n_events, latencies, connected, errors), daemon=True)
+               for _ in range(n_viewers)]
+    for t in threads:
+        t.start()
+    for _ in threads:
+        connected.acquire()
+    # Response headers arrive before the generator subscribes; wait until every stream is listening
+    deadline = time.time() + 30
+    while broker.subscriber_count < n_viewers and time.time() < deadline:
+        time.sleep(0.01)
+
+    publish_times = []
+    for _ in range(n_events):
+        start = time.perf_counter()
+        broker.publish('bench', {'sent': start})
+        publish_times.append(time.perf_counter() - start)
+        time.sleep(interval)
+
+    for t in threads:
+        t.join(timeout=60)
+    broker.close_all()
+
+    delivered = sum(len(r) for r in latencies)
+    all_ms = np.concatenate([np.array(r) for r in latencies if r] or [np.zeros(0)]) * 1000
+    return {
+        'viewers': n_viewers,
+        'delivered': delivered,
+        'expected': n_viewers * n_events,
+        'p50_ms': float(np.percentile(all_ms, 50)) if len(all_ms) else None,
+        'p99_ms': float(np.percentile(all_ms, 99)) if len(all_ms) else None,
+        'max_ms': float(all_ms.max()) if len(all_ms) else None,
+        'publish_ms': float(np.mean(publish_times) * 1000),
+        'errors': errors
+    }
+
+
+def limit_check(broker, port, cookie, limit=3):
+    """Open `limit` streams, then one more; returns (status, Retry-After) of the extra one."""
+    broker.configure(limit)
+    held = []
+    for _ in range(limit + 1):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.request('GET', '/events', headers={'Cookie': cookie, 'Accept': 'text/event-stream'})
+        held.append((conn, conn.getresponse()))
+    _, extra = held[-1]
+    result = (extra.status, extra.getheader('Retry-After'))
+    broker.close_all()
+    for conn, _ in held:
+        conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--viewers', type=int, nargs='+', default=[10, 100, 250, 500, 1000])
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between published events.')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault('DRIFT_SNAPSHOT_DIR', os.path.join(tmp, 'drift'))
+    os.environ['SSE_MAX_STREAMS'] = str(max(args.viewers))
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+        from app.events import broker
+        app = create_app()
+    app.test_client().post('/register', data={'email': 'bench@example.com', 'name': 'Bench', 'phone': '0',
+                                              'password': 'bench', 'confirm_password': 'bench', 'role': 'Admin'})
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    WSGIRequestHandler.log_request = lambda *a, **k: None
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.request_queue_size = 4096
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    cookie = login_cookie(port)
+
+    print(f"{args.events} events every {args.interval * 1000:.0f}ms, latency budget p99 < {LATENCY_BUDGET_MS}ms")
+    print(f"{'viewers':>8s} {'delivered':>12s} {'p50':>9s} {'p99':>9s} {'max':>9s} {'publish':>9s}")
+    sustained = 0
+    for n in args.viewers:
+        result = run(broker, port, cookie, n, args.events, args.interval)
+        ok = (result['delivered'] == result['expected'] and result['p99_ms'] is not None
+              and result['p99_ms'] < LATENCY_BUDGET_MS)
+        print(f"{n:8d} {result['delivered']:6d}/{result['expected']:<6d}"
+              f"{result['p50_ms'] or 0:8.1f}ms {result['p99_ms'] or 0:7.1f}ms {result['max_ms'] or 0:7.1f}ms "
+              f"{result['publish_ms']:7.3f}ms{'' if ok else '  (not sustained)'}")
+        if result['errors']:
+            print(f"         {len(result['errors'])} connection error(s), e.g. {result['errors'][0]}")
+        if ok:
+            sustained = n
+        else:
+            break
+    status, retry_after = limit_check(broker, port, cookie)
+    server.shutdown()
+    print(f"\nOne worker process sustained {sustained} concurrent viewers. Under gunicorn each open stream "
+          f"holds one gthread thread; SSE_MAX_STREAMS (default WEB_THREADS // 2) keeps the rest for normal requests.")
+    print(f"Stream past the limit: HTTP {status}, Retry-After {retry_after}")
+
+
+if __name__ == '__main__':
+    main()
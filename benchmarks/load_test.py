@@ -0,0 +1,296 @@
+"""
+End-to-end load test against create_app().
+
+Seeds a database with benchmarks/synthetic_data.py (or reuses one), then runs
+each scenario with several threads, each holding its own logged-in test
+client, and reports throughput and latency percentiles. Results can be saved
+as a JSON baseline and later runs compared against it; a scenario whose p95
+latency or throughput moves past the tolerance is flagged as a regression
+and the exit status is 1.
+
+    python benchmarks/load_test.py --scale small --save-baseline local
+    python benchmarks/load_test.py --scale small --compare local
+    python benchmarks/load_test.py --database /tmp/load.db --scenarios predict_single history_filtered --threads 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import warnings
+import contextlib
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from synthetic_data import SCALES, LOADTEST_PASSWORD, create_seeded_app, random_features  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+BASELINE_SCHEMA_VERSION = 1
+
+# Relative change in p95 latency / throughput that counts as a regression
+DEFAULT_TOLERANCE = 0.20
+
+PERCENTILES = (50, 90, 95, 99)
+FEATURE_FIELDS = ['age', 'sex', 'cp', 'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal']
+
+
+class Context:
+    """What scenarios need to know about the seeded data."""
+    def __init__(self, app):
+        from app import db
+        from app.models import Patient
+        with app.app_context():
+            self.patient_ids = [row[0] for row in db.session.query(Patient.id).limit(50000)]
+        self.today = datetime.date.today()
+
+    def days_ago(self, n):
+        return (self.today - datetime.timedelta(days=n)).isoformat()
+
+
+def _prediction_form(rng, ctx, model_name):
+    values = random_features(np.random.default_rng(rng.randrange(2 ** 32)), 1)[0]
+    form = {name: str(v) for name, v in zip(FEATURE_FIELDS, values)}
+    form.update(patient_id=str(rng.choice(ctx.patient_ids)), model_name=model_name)
+    return form
+
+
+def login(client, rng, ctx, email):
+    client.get('/logout')
+    response = client.post('/login', data={'email': email, 'password': LOADTEST_PASSWORD})
+    # A failed login redirects back to /login
+    return response, response.status_code == 302 and response.location.endswith('/dashboard')
+
+
+def dashboard(client, rng, ctx, email):
+    response = client.get('/dashboard')
+    return response, response.status_code == 200
+
+
+def reports(client, rng, ctx, email):
+    response = client.get('/reports')
+    return response, response.status_code == 200
+
+
+def compare_models(client, rng, ctx, email):
+    response = client.get('/compare_models')
+    return response, response.status_code == 200
+
+
+def predict_single(client, rng, ctx, email):
+    model = rng.choice(['Random Forest', 'Logistic Regression'])
+    response = client.post('/predict', data=_prediction_form(rng, ctx, model))
+    return response, response.status_code == 200
+
+
+def predict_both(client, rng, ctx, email):
+    response = client.post('/predict', data=_prediction_form(rng, ctx, 'Both Models'))
+    return response, response.status_code == 200
+
+
+def history_filtered(client, rng, ctx, email):
+    params = {'date_filter': ctx.days_ago(rng.randint(1, 7)),
+              'risk_status': rng.choice(['Heart Disease Detected', 'No Heart Disease', '']),
+              'model_used': rng.choice(['Random Forest', 'Logistic Regression', ''])}
+    if rng.random() < 0.3:
+        params['patient_name'] = rng.choice(['Bello', 'Grace', 'Okafor', 'Musa'])
+    response = client.get('/history', query_string=params)
+    return response, response.status_code == 200
+
+
+def export_csv(client, rng, ctx, email):
+    params = {'export': 'csv', 'date_filter': ctx.days_ago(rng.randint(1, 7)), 'risk_status': 'Heart Disease Detected'}
+    response = client.get('/history', query_string=params)
+    return response, response.status_code == 200
+
+
+def export_pdf(client, rng, ctx, email):
+    params = {'export': 'pdf', 'date_filter': ctx.days_ago(rng.randint(1, 3)), 'risk_status': 'Heart Disease Detected'}
+    response = client.get('/history', query_string=params)
+    return response, response.status_code == 200
+
+
+SCENARIOS = {
+    'login': login,
+    'dashboard': dashboard,
+    'reports': reports,
+    'compare_models': compare_models,
+    'predict_single': predict_single,
+    'predict_both': predict_both,
+    'history_filtered': history_filtered,
+    'export_csv': export_csv,
+    'export_pdf': export_pdf,
+}
+
+
+def _worker(app, scenario, ctx, email, seed, start_at, warm_until, stop_at, latencies, errors):
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': LOADTEST_PASSWORD})
+    while time.perf_counter() < start_at:
+        time.sleep(0.001)
+    while True:
+        t0 = time.perf_counter()
+        if t0 >= stop_at:
+            break
+        try:
+            response, ok = scenario(client, rng, ctx, email)
+            response.get_data()
+            response.close()
+        except Exception:
+            ok = False
+        t1 = time.perf_counter()
+        if t0 >= warm_until:
+            latencies.append(t1 - t0)
+            if not ok:
+                errors.append(t1 - t0)
+
+
+def run_scenario(app, name, ctx, emails, threads, duration, warmup, seed):
+    latencies, errors = [], []
+    start_at = time.perf_counter() + 0.5
+    warm_until = start_at + warmup
+    stop_at = warm_until + duration
+    workers = [threading.Thread(target=_worker, args=(app, SCENARIOS[name], ctx, emails[i % len(emails)], seed + i,
+                                                      start_at, warm_until, stop_at, latencies, errors))
+               for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    ms = np.array(latencies) * 1000
+    result = {
+        'requests': len(ms),
+        'errors': len(errors),
+        'throughput_rps': len(ms) / duration,
+        'latency_ms': {f'p{p}': float(np.percentile(ms, p)) for p in PERCENTILES} if len(ms) else {},
+    }
+    if len(ms):
+        result['latency_ms'].update(mean=float(ms.mean()), max=float(ms.max()))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """Rows of (scenario, p95 change, throughput change, regression reasons)."""
+    rows = []
+    for name, result in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if not base or not base['requests'] or not result['requests']:
+            continue
+        p95_change = result['latency_ms']['p95'] / base['latency_ms']['p95'] - 1
+        rps_change = result['throughput_rps'] / base['throughput_rps'] - 1
+        reasons = []
+        if p95_change > tolerance:
+            reasons.append('p95 latency')
+        if rps_change < -tolerance:
+            reasons.append('throughput')
+        if result['errors'] / result['requests'] > base['errors'] / base['requests']:
+            reasons.append('error rate')
+        rows.append((name, p95_change, rps_change, reasons))
+    return rows
+
+
+def print_results(results):
+    header = ' '.join(f"{'p' + str(p):>8s}" for p in PERCENTILES)
+    print(f"\n{'scenario':18s} {'requests':>8s} {'errors':>6s} {'req/s':>8s} {header} {'max':>8s}   (ms)")
+    for name, r in results.items():
+        lat = r['latency_ms']
+        cells = ' '.join(f"{lat.get('p' + str(p), 0):8.1f}" for p in PERCENTILES)
+        print(f"{name:18s} {r['requests']:8d} {r['errors']:6d} {r['throughput_rps']:8.1f} {cells} {lat.get('max', 0):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLite file to use; generated at --scale if it does not exist. '
+                                           'Defaults to a temporary file.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per scenario.')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each scenario.')
+    parser.add_argument('--save-baseline', metavar='NAME', help=f'Write results to {os.path.relpath(BASELINE_DIR)}/NAME.json.')
+    parser.add_argument('--compare', metavar='NAME', help='Compare with a saved baseline and exit 1 on regressions.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative change in p95 latency and throughput.')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, args.compare + '.json')) as f:
+            baseline = json.load(f)
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault('DRIFT_SNAPSHOT_DIR', os.path.join(tmp, 'drift'))
+    database = args.database or os.path.join(tmp, 'load.db')
+    app = create_seeded_app(database, args.scale, args.seed)
+    ctx = Context(app)
+
+    from app import db
+    from app.models import User, Patient, Prediction, Appointment
+    with app.app_context():
+        emails = [row[0] for row in db.session.query(User.email).filter(User.email.like('loadtest%')).limit(args.threads)]
+        rows = {model.__tablename__: model.query.count() for model in (User, Patient, Prediction, Appointment)}
+    print(f"Database: {', '.join(f'{n} {t}' for t, n in rows.items())}")
+    print(f"{args.threads} threads, {args.warmup:g}s warm-up + {args.duration:g}s per scenario")
+
+    results = {}
+    for name in args.scenarios:
+        # Routes print debug lines on every prediction; keep them out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results[name] = run_scenario(app, name, ctx, emails, args.threads, args.duration, args.warmup, args.seed)
+        print(f"  {name}: {results[name]['requests']} requests")
+    print_results(results)
+
+    document = {
+        'schema_version': BASELINE_SCHEMA_VERSION,
+        'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'scale': args.scale if not args.database else None, 'seed': args.seed, 'threads': args.threads,
+                   'duration': args.duration, 'warmup': args.warmup, 'rows': rows},
+        'scenarios': results
+    }
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, args.save_baseline + '.json')
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"\nSaved baseline {path}")
+
+    if baseline is not None:
+        if baseline['config']['threads'] != args.threads or baseline['config']['rows'] != rows:
+            print("\nWarning: baseline was recorded with different threads or data; comparison is approximate.")
+        print(f"\nCompared with baseline '{args.compare}' ({baseline.get('git_commit') or 'unknown commit'}, "
+              f"tolerance {args.tolerance:.0%})")
+        regressions = 0
+        for name, p95_change, rps_change, reasons in compare(document, baseline, args.tolerance):
+            flag = 'REGRESSION: ' + ', '.join(reasons) if reasons else 'ok'
+            print(f"  {name:18s} p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}  {flag}")
+            regressions += bool(reasons)
+        if regressions:
+            print(f"\n{regressions} scenario(s) regressed")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Seeded synthetic data for load tests: users, patients, predictions and
+appointments, bulk-inserted in chunks so millions of rows stay practical.
+The same seed and scale always produce the same rows, with timestamps
+relative to when they are generated.
+
+    python benchmarks/synthetic_data.py --scale medium --database /tmp/load.db
+    python benchmarks/synthetic_data.py --predictions 2000000 --patients 200000 --database /tmp/big.db
+
+Every generated user can log in with LOADTEST_PASSWORD; their e-mails are
+loadtest<N>@example.com.
+"""
+import os
+import sys
+import io
+import time
+import argparse
+import datetime
+import contextlib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOADTEST_PASSWORD = 'loadtest'
+CHUNK_SIZE = 20000
+
+SCALES = {
+    'small': {'users': 20, 'patients': 1000, 'predictions': 10000, 'appointments': 5000},
+    'medium': {'users': 100, 'patients': 20000, 'predictions': 200000, 'appointments': 50000},
+    'large': {'users': 500, 'patients': 200000, 'predictions': 2000000, 'appointments': 500000},
+}
+
+ROLES = ['Doctor', 'Doctor', 'Nurse', 'Receptionist', 'Admin']
+FIRST_NAMES = ['Amina', 'Chinedu', 'Fatima', 'Grace', 'Ibrahim', 'James', 'Kwame', 'Maria', 'Ngozi', 'Oluwaseun',
+               'Peter', 'Sarah', 'Tunde', 'Yusuf', 'Zainab', 'David', 'Esther', 'Musa', 'Ruth', 'Samuel']
+LAST_NAMES = ['Adeyemi', 'Bello', 'Eze', 'Johnson', 'Mensah', 'Nwosu', 'Okafor', 'Okoro', 'Smith', 'Usman',
+              'Williams', 'Abubakar', 'Danjuma', 'Ibekwe', 'Lawal']
+MODELS = ['Random Forest', 'Logistic Regression']
+APPOINTMENT_STATUSES = ['Pending', 'Completed', 'Completed', 'Cancelled']
+
+
+def user_email(i):
+    return f'loadtest{i}@example.com'
+
+
+def random_features(rng, n):
+    """(n, 9) inputs in the ranges the prediction form accepts, in DEFAULT_FEATURE_NAMES order."""
+    return np.column_stack([
+        rng.integers(29, 78, n),                      # age
+        rng.integers(0, 2, n),                        # sex
+        rng.integers(0, 4, n),                        # cp
+        rng.integers(90, 203, n),                     # thalach
+        rng.integers(0, 2, n),                        # exang
+        np.round(rng.gamma(1.2, 0.9, n).clip(0, 6.2), 1),  # oldpeak
+        rng.integers(0, 3, n),                        # slope
+        rng.integers(0, 4, n),                        # ca
+        rng.integers(1, 4, n),                        # thal
+    ]).astype(float)
+
+
+def _names(rng, n):
+    first = rng.choice(FIRST_NAMES, n)
+    last = rng.choice(LAST_NAMES, n)
+    return [f'{a} {b} {i}' for i, (a, b) in enumerate(zip(first, last))]
+
+
+def _insert(db, table, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[i:i + CHUNK_SIZE])
+    db.session.commit()
+
+
+def _insert_columns(db, table, columns, n):
+    """Insert n rows given as {column: sequence}, building row dicts one chunk at a time."""
+    names = list(columns)
+    for i in range(0, n, CHUNK_SIZE):
+        chunk = [dict(zip(names, values)) for values in zip(*(columns[k][i:i + CHUNK_SIZE] for k in names))]
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+
+
+def _appointment_grid(hours, slot, start, end):
+    grid = []
+    t = start
+    while True:
+        t = hours.next_open(t, slot)
+        if t is None or t >= end:
+            return grid
+        grid.append(t)
+        t += slot
+
+
+def generate(app, users, patients, predictions, appointments, days=365, seed=0):
+    """
+    Fill the app's database. Predictions are spread over the last `days` days;
+    appointments over the same period plus 30 days ahead, never overlapping
+    for a doctor. Returns {table: rows inserted}.
+    """
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import User, Patient, Prediction, Appointment
+    from app.scheduling import scheduler
+
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    counts = {}
+
+    with app.app_context():
+        # One hash shared by every account: hashing per user would dominate seeding time
+        password_hash = generate_password_hash(LOADTEST_PASSWORD, method='scrypt')
+        first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        roles = rng.choice(ROLES, users)
+        names = _names(rng, users)
+        _insert(db, User.__table__, [
+            {'full_name': names[i], 'email': user_email(first_user + i), 'phone_number': f'080{rng.integers(10 ** 7, 10 ** 8)}',
+             'role': str(roles[i]), 'password_hash': password_hash, 'is_active': True, 'created_at': now}
+            for i in range(users)])
+        user_ids = np.arange(first_user, first_user + users)
+        doctor_ids = user_ids[roles == 'Doctor']
+        counts['user'] = users
+
+        first_patient = (db.session.query(db.func.max(Patient.id)).scalar() or 0) + 1
+        dob_days = rng.integers(0, 365 * 60, patients)
+        _insert_columns(db, Patient.__table__, {
+            'full_name': _names(rng, patients),
+            'gender': rng.choice(['Male', 'Female'], patients).tolist(),
+            'dob': [datetime.date(1940, 1, 1) + datetime.timedelta(days=int(d)) for d in dob_days],
+            'phone': [f'080{x}' for x in rng.integers(10 ** 7, 10 ** 8, patients)],
+            'medical_history': rng.choice(['', 'Hypertension', 'Diabetes', 'Smoker', 'Family history'], patients).tolist(),
+            'created_at': [now] * patients
+        }, patients)
+        patient_ids = np.arange(first_patient, first_patient + patients)
+        counts['patient'] = patients
+
+        features = random_features(rng, predictions)
+        probability = np.round(rng.beta(2, 2, predictions), 4)
+        offsets = np.sort(rng.integers(0, days * 86400, predictions))[::-1]
+        _insert_columns(db, Prediction.__table__, {
+            'patient_id': rng.choice(patient_ids, predictions).tolist(),
+            'prediction_result': np.where(probability > 0.5, 'Heart Disease Detected', 'No Heart Disease').tolist(),
+            'probability_score': probability.tolist(),
+            'model_used': rng.choice(MODELS, predictions).tolist(),
+            'input_data': [str(row) for row in features.tolist()],
+            'created_at': [now - datetime.timedelta(seconds=int(s)) for s in offsets]
+        }, predictions)
+        counts['prediction'] = predictions
+
+        # Appointments sit on free slots of each doctor's working grid, so they never overlap
+        rows = 0
+        if appointments and len(doctor_ids):
+            start = datetime.datetime.combine(now.date() - datetime.timedelta(days=days), datetime.time())
+            grid = np.array(_appointment_grid(scheduler.hours, scheduler.slot, start, start + datetime.timedelta(days=days + 30)))
+            per_doctor = min(-(-appointments // len(doctor_ids)), len(grid))
+            for doctor_id in doctor_ids:
+                n = min(per_doctor, appointments - rows)
+                if n <= 0:
+                    break
+                _insert_columns(db, Appointment.__table__, {
+                    'patient_id': rng.choice(patient_ids, n).tolist(),
+                    'doctor_id': [int(doctor_id)] * n,
+                    'appointment_date': grid[rng.choice(len(grid), n, replace=False)].tolist(),
+                    'status': rng.choice(APPOINTMENT_STATUSES, n).tolist(),
+                    'notes': [''] * n,
+                    'created_at': [now] * n
+                }, n)
+                rows += n
+        counts['appointment'] = rows
+        scheduler.forget()
+    return counts
+
+
+def create_seeded_app(database, scale=None, seed=0, **sizes):
+    """create_app() against `database` (a SQLite path), generating data first if the file is new."""
+    fresh = not os.path.exists(database)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(database)}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+        app = create_app()
+    if fresh:
+        sizes = {**SCALES[scale or 'small'], **{k: v for k, v in sizes.items() if v is not None}}
+        start = time.perf_counter()
+        counts = generate(app, seed=seed, **sizes)
+        print(f"Generated {', '.join(f'{n} {table}' for table, n in counts.items())} "
+              f"in {time.perf_counter() - start:.1f}s")
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file to create (must not exist yet).')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    for table in ('users', 'patients', 'predictions', 'appointments'):
+        parser.add_argument(f'--{table}', type=int, default=None, help=f'Override the preset number of {table}.')
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f'{args.database} already exists')
+    create_seeded_app(args.database, args.scale, args.seed, users=args.users, patients=args.patients,
+                      predictions=args.predictions, appointments=args.appointments)
+
+
+if __name__ == '__main__':
+    main()
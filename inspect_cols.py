@@ -1,8 +1,10 @@
 
 import pickle
 import os
+import sys
 
-path = r"C:\Users\user\Downloads\Heartfelt\model_columns.pkl"
+# Defaults to the file next to this script; pass another path as the first argument
+path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_columns.pkl')
 
 if os.path.exists(path):
     try:
@@ -6,7 +6,8 @@ import sys
 # Force encoding to handle potential issues
 sys.stdout.reconfigure(encoding='utf-8')
 
-file_path = r"C:\Users\user\Downloads\Heartfelt\heart_model.pkl"
+# Defaults to the model next to this script; pass another path as the first argument
+file_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'heart_model.pkl')
 
 if not os.path.exists(file_path):
     print("File not found.")
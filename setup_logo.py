@@ -1,40 +1,22 @@
-import os
-import shutil
-import sys
-
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("PIL not available")
+"""
+Install a new logo and rebuild the static assets. Shortcut for:
 
-source = r"C:\Users\user\Downloads\Heartfelt\WhatsApp Image 2026-02-02 at 11.58.43 PM.jpeg"
-dest_dir = r"C:\Users\user\Downloads\Heartfelt\app\static\images"
-dest = os.path.join(dest_dir, "logo.jpeg")
+    flask --app run build-assets --logo PATH
 
-# Ensure dir exists (redundant but safe)
-os.makedirs(dest_dir, exist_ok=True)
+    python setup_logo.py PATH
+"""
+import os
+import sys
 
-# Copy file
-shutil.copy2(source, dest)
-print(f"Copied image to {dest}")
+from app.assets import build_assets, logo_colors, LOGO_PATH
 
-def rgb_to_hex(rgb):
-    return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static')
 
-if PIL_AVAILABLE:
-    try:
-        img = Image.open(dest)
-        img = img.resize((150, 150))
-        result = img.convert('P', palette=Image.ADAPTIVE, colors=5)
-        result.putalpha(0)
-        colors = result.getcolors(150*150)
-        # Sort by count
-        colors.sort(key=lambda x: x[0], reverse=True)
-        
-        print("Dominant colors:")
-        for count, col in colors[:3]:
-            print(f"{col}: {rgb_to_hex(col[:3])}")
-    except Exception as e:
-        print(f"Error processing image: {e}")
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__.strip())
+    build_assets(STATIC_DIR, logo=sys.argv[1])
+    print(f"Copied image to {os.path.join(STATIC_DIR, LOGO_PATH)} and rebuilt {STATIC_DIR}/dist")
+    print("Dominant colors:")
+    for color in logo_colors(os.path.join(STATIC_DIR, LOGO_PATH)):
+        print(color)